@@ -0,0 +1,350 @@
+"""
+Measures the speed and memory use of the solver on a fixed ladder of instances,
+saves the results as JSON and compares them with a baseline saved earlier on the same machine
+The ladder is every bundled config/*.cnf followed by random 3-SAT instances of increasing size, generated by
+ generate_cnf.py from a fixed seed so that every machine benchmarks the same instances
+Hot paths are timed in this process, full runs are fixed-seed runs of run.py timed with its --profile-output
+Every timing is repeated, a result only counts as a regression when it got worse by more than the tolerance, by more
+ than the noise floor and by clearly more than the spread of the repeated measurements
+"""
+
+# Built-ins
+import os
+import math
+import sys
+import glob
+import json
+import shlex
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import collections
+import multiprocessing
+import timeit
+
+# Third-party libraries
+import numpy
+
+# Custom imports
+import reader
+import pareto
+import populations
+import initializers
+import parent_selectors
+import survival_selectors
+import recombination
+import mutations
+import diversity_metrics
+
+VERSION = 2
+
+directory = os.path.dirname(os.path.abspath(__file__))
+timer = timeit.default_timer
+# Loops shorter than this are dominated by timer resolution and scheduling noise
+minimum_loop_seconds = 0.05
+# Number of spreads by which a result must get worse to be told apart from noise
+significance = 3.0
+
+parser = argparse.ArgumentParser(description='Benchmarks the hot paths and full runs of run.py on a ladder of '
+                                             'instances, optionally comparing the results with a baseline.')
+
+parser.add_argument('--output', '-o', dest='output', default='benchmark.json', type=str, required=False,
+                    help='Path to a JSON file to be generated containing the results.')
+parser.add_argument('--baseline', '-b', dest='baseline', default=None, type=str, required=False,
+                    help='Path to the JSON results of an earlier benchmark to compare with.  '
+                         'The exit status is 1 if anything got slower (or bigger) by more than --tolerance.')
+parser.add_argument('--tolerance', '-t', dest='tolerance', default=0.1, type=float, required=False,
+                    help='Fraction by which a result may be worse than the baseline before it counts as a regression.')
+parser.add_argument('--noise-floor', dest='noise_floor', default=5e-5, type=float, required=False,
+                    help='Seconds by which a hot path may get slower before it counts as a regression, '
+                         'however large the relative change.')
+parser.add_argument('--sizes', dest='sizes', default=[1000, 10000, 100000], type=int, nargs='*', required=False,
+                    help='Numbers of variables of the random 3-SAT instances of the ladder.')
+parser.add_argument('--ratio', dest='ratio', default=4.26, type=float, required=False,
+                    help='Ratio of clauses to variables of the random instances.')
+parser.add_argument('--seed', '-s', dest='seed', default=1, type=int, required=False,
+                    help='Random number seed of the instances, the timed populations and the full runs.')
+parser.add_argument('--repeats', '-r', dest='repeats', default=7, type=int, required=False,
+                    help='Every hot path is timed this many times, the median and the spread are kept.')
+parser.add_argument('--run-repeats', dest='run_repeats', default=3, type=int, required=False,
+                    help='Every full run is performed this many times, the median and the spread are kept.')
+parser.add_argument('--population-size', '-p', dest='population_size', default=100, type=int, required=False,
+                    help='Population size of the timed hot paths and the full runs.')
+parser.add_argument('--children', '-i', dest='children', default=100, type=int, required=False,
+                    help='Offspring size of the timed hot paths and the full runs.')
+parser.add_argument('--evals', '-e', dest='evals', default=10000, type=int, required=False,
+                    help='Number of fitness evaluations of every full run.')
+parser.add_argument('--run-variables', dest='run_variables', default=10000, type=int, required=False,
+                    help='Only instances with at most this many variables get a full run.')
+parser.add_argument('--run-args', dest='run_args', default='', type=str, required=False,
+                    help='Additional arguments for run.py, such as "--mutation sparse --incremental".')
+
+args = parser.parse_args()
+
+if args.repeats < 3 or args.run_repeats < 3:
+    parser.error('--repeats and --run-repeats must be at least 3 to estimate the spread of the measurements')
+
+
+def ladder(instance_directory):
+    """
+    :return: list of (name, filename) of every instance, smallest first
+    """
+    instances = [(os.path.basename(x), x) for x in sorted(glob.glob(os.path.join(directory, 'config', '*.cnf')))]
+    for number_of_variables in sorted(args.sizes):
+        name = 'random-3-sat-{0}'.format(number_of_variables)
+        subprocess.check_call([sys.executable, os.path.join(directory, 'generate_cnf.py'), '--name', name,
+                               '--directory', instance_directory, '--family', 'uniform', '--literals', '3',
+                               '--variables', str(number_of_variables), '--ratio', str(args.ratio),
+                               '--seed', str(args.seed)])
+        instances.append((name, os.path.join(instance_directory, name, name + '.cnf')))
+    return instances
+
+
+def read_equation(filename):
+    with reader.open_DIMACS(filename) as f:
+        return reader.read_DIMACS_stream(f)
+
+
+def summarize(samples):
+    """
+    :return: dict, the median of samples and their spread, the median absolute deviation scaled to match the
+     standard deviation of normally distributed samples, which unlike it is not thrown off by a few outliers
+    """
+    samples = numpy.asarray(samples, dtype=float)
+    median = numpy.median(samples)
+    return collections.OrderedDict([('median', float(median)),
+                                    ('spread', float(1.4826 * numpy.median(numpy.abs(samples - median))))])
+
+
+def time_loop(function, number):
+    """
+    :return: float, seconds per call of a loop of number calls
+    """
+    start = timer()
+    for _ in range(number):
+        function()
+    return (timer() - start) / number
+
+
+def loop_length(function):
+    """
+    :return: int, the number of calls of function in a loop long enough to be timed reliably
+    """
+    number = 1
+    while time_loop(function, number) * number < minimum_loop_seconds:
+        number *= 2
+    return number
+
+
+def time_operations(operations, repeats):
+    """
+    Times every operation once per round, so that the spread of the rounds includes the slow drift of the machine
+     and not only the jitter of back to back loops
+    :param operations: list of (name, function)
+    :return: dict, summary of the seconds per call of every operation by name
+    """
+    numbers = [loop_length(function) for _, function in operations]
+    times = [[time_loop(function, number) for (_, function), number in zip(operations, numbers)]
+             for _ in range(repeats)]
+    return collections.OrderedDict((name, summarize(samples)) for (name, _), samples in zip(operations, zip(*times)))
+
+
+def hot_paths(filename, equation):
+    """
+    :return: list of (name, function) of every timed operation, on a random population of the equation
+    """
+    size = args.population_size + args.children
+    genomes = initializers.initialize(size, equation.number_of_variables).astype(populations.GENOME_DTYPE)
+    population = pareto.rank(populations.create(genomes, equation.evaluate(genomes),
+                                                equation.count_free_variables(genomes)))
+    zipped = population.zipped()
+    parents = population.take(slice(0, args.population_size))
+    parent_rows = parents.rows[parent_selectors.uniform_random(args.children)(parents)]
+    offspring = numpy.empty(shape=(args.children, equation.number_of_variables), dtype=populations.GENOME_DTYPE)
+    children = genomes[:args.children].copy()
+    number_of_variables = equation.number_of_variables
+    operations = [
+        ('parse', lambda: read_equation(filename)),
+        ('evaluate', lambda: equation.evaluate(genomes)),
+        ('count_free_variables', lambda: equation.count_free_variables(genomes)),
+        ('generate_fronts', lambda: pareto.generate_fronts(zipped)),
+        ('rank', lambda: pareto.rank(population)),
+        ('front_spread', lambda: diversity_metrics.front_spread(
+            numpy.column_stack((population.fitnesses, population.simplicities)), [0, 0],
+            [equation.number_of_clauses, number_of_variables])),
+        ('mean_hamming_distance', lambda: diversity_metrics.mean_hamming_distance(genomes)),
+        ('gene_entropy', lambda: diversity_metrics.gene_entropy(genomes)),
+    ]
+    for name, select in [('random', parent_selectors.uniform_random(args.children)),
+                         ('FPS', parent_selectors.fitness_prop_selection(args.children)),
+                         ('kTourn', parent_selectors.k_tournament_with_replacement(args.children, 20))]:
+        operations.append(('parent selection ' + name, lambda select=select: select(parents)))
+    for name, select in [('random', survival_selectors.uniform_random(args.population_size)),
+                         ('FPS', survival_selectors.fitness_prop_selection(args.population_size)),
+                         ('Truncation', survival_selectors.truncate(args.population_size)),
+                         ('kTourn', survival_selectors.k_tournament_without_replacement(args.population_size, 20))]:
+        operations.append(('survival selection ' + name, lambda select=select: select(population)))
+    for name, recombine in [('one-point', recombination.crossover(number_of_variables)),
+                            ('two-point', recombination.two_point_crossover(number_of_variables)),
+                            ('uniform', recombination.uniform_crossover(number_of_variables))]:
+        operations.append(('recombination ' + name,
+                           lambda recombine=recombine: recombine(parents.genomes, parent_rows, offspring)))
+    for name, mutate in [('flip', mutations.flip_bits(number_of_variables)),
+                         ('sparse', mutations.flip_bits_sparse(number_of_variables)),
+                         ('swap', mutations.swap_bit(number_of_variables))]:
+        operations.append(('mutation ' + name, lambda mutate=mutate: mutate(children)))
+    return operations
+
+
+def peak_rss():
+    """
+    :return: int, the peak resident set size of this process so far, in bytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def equation_bytes(equation):
+    """
+    :return: int, memory used by the clause arrays of an equation
+    """
+    return sum(x.nbytes for x in [equation.clause_offsets, equation.clause_starts, equation.literal_variables,
+                                  equation.literal_values])
+
+
+def benchmark_instance(name, filename):
+    """
+    Times every hot path on an instance
+    The peak RSS of the process only grows and depends on what was freed before, so it is recorded but not compared,
+     the memory used by the equation is
+    :return: dict
+    """
+    numpy.random.seed(args.seed)
+    equation = read_equation(filename)
+    timings = time_operations(hot_paths(filename, equation), args.repeats)
+    for operation in timings:
+        print('{0:<24}{1:<32}{2:>14.6f} s +- {3:.6f}'.format(name, operation, timings[operation]['median'],
+                                                              timings[operation]['spread']))
+    return collections.OrderedDict([('variables', equation.number_of_variables),
+                                    ('clauses', equation.number_of_clauses),
+                                    ('equation_bytes', equation_bytes(equation)),
+                                    ('peak_rss_bytes', peak_rss()),
+                                    ('timings', timings)])
+
+
+def benchmark_run(name, filename, output_directory):
+    """
+    Performs fixed-seed runs of run.py on an instance, each in its own process
+    :return: dict, the --profile-output summary of the run with the median speed, and the summary of the speeds
+    """
+    profile_filename = os.path.join(output_directory, name + '.profile')
+    command = [sys.executable, os.path.join(directory, 'run.py'), '-c', filename, '-s', str(args.seed), '-r', '1',
+               '-e', str(args.evals), '-p', str(args.population_size), '-i', str(args.children),
+               '-l', os.path.join(output_directory, name + '.log'),
+               '-u', os.path.join(output_directory, name + '.solution'),
+               '--profile-output', profile_filename] + shlex.split(args.run_args)
+    profiles = list()
+    for _ in range(args.run_repeats):
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(command, stdout=devnull)
+        with open(profile_filename) as f:
+            profiles.append(json.loads(f.readline(), object_pairs_hook=collections.OrderedDict))
+    speeds = summarize([x['evals_per_second'] for x in profiles])
+    profile = sorted(profiles, key=lambda x: x['evals_per_second'])[len(profiles) // 2]
+    print('{0:<24}{1:<32}{2:>14.1f} evaluations/second +- {3:.1f}'.format(name, 'full run', speeds['median'],
+                                                                          speeds['spread']))
+    run = collections.OrderedDict((k, profile[k]) for k in ['evals', 'seconds', 'peak_rss_bytes', 'phases'])
+    run['evals_per_second'] = speeds
+    return run
+
+
+def metrics(results, noise_floor):
+    """
+    :param noise_floor: float, the smallest change of a hot path timing (in seconds) which is not noise
+    :return: dict of (value, spread, smallest change which is not noise, whether higher is better) by metric name,
+     of every comparable result
+    """
+    found = collections.OrderedDict()
+    for name, instance in results['instances'].items():
+        for operation, timing in instance['timings'].items():
+            found['{0} {1} (s)'.format(name, operation)] = (timing['median'], timing['spread'], noise_floor, False)
+        found['{0} equation (MB)'.format(name)] = (instance['equation_bytes'] / 2.0 ** 20, 0.0, 0.0, False)
+    for name, run in results['runs'].items():
+        found['{0} full run (evals/s)'.format(name)] = (run['evals_per_second']['median'],
+                                                        run['evals_per_second']['spread'], 0.0, True)
+        found['{0} full run peak RSS (MB)'.format(name)] = (run['peak_rss_bytes'] / 2.0 ** 20, 0.0, 0.0, False)
+    return found
+
+
+def compare(baseline, results, tolerance, noise_floor):
+    """
+    Prints every metric found in both results with its relative change, positive changes being worse
+    A metric regresses when it got worse by more than tolerance, by more than its noise floor and by more than
+     significance times the combined spread of both measurements
+    :return: list of names of the metrics which regressed
+    """
+    if baseline['machine'] != results['machine']:
+        print('Warning: the baseline was measured on a different machine: {0}'.format(baseline['machine']))
+    if baseline['options'] != results['options']:
+        print('Warning: the baseline was measured with different options: {0}'.format(baseline['options']))
+    old, new = metrics(baseline, noise_floor), metrics(results, noise_floor)
+    regressions = list()
+    print('{0:<56}{1:>14}{2:>14}{3:>10}'.format('metric', 'baseline', 'new', 'change'))
+    for name in (x for x in new if x in old):
+        (old_value, old_spread, floor, higher_is_better), (new_value, new_spread, _, _) = old[name], new[name]
+        if higher_is_better:
+            change = old_value / new_value - 1 if new_value else float('inf')
+        else:
+            change = new_value / old_value - 1 if old_value else 0.0
+        worsening = old_value - new_value if higher_is_better else new_value - old_value
+        noise = max(floor, significance * math.hypot(old_spread, new_spread))
+        regressed = change > tolerance and worsening > noise
+        if regressed:
+            regressions.append(name)
+        print('{0:<56}{1:>14.6g}{2:>14.6g}{3:>+9.1f}%{4}'.format(name, old_value, new_value, 100 * change,
+                                                                 '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+results = collections.OrderedDict([
+    ('version', VERSION),
+    ('machine', collections.OrderedDict([('platform', platform.platform()), ('processor', platform.processor()),
+                                         ('cpus', multiprocessing.cpu_count()),
+                                         ('python', platform.python_version()), ('numpy', numpy.__version__)])),
+    ('options', collections.OrderedDict((k, getattr(args, k)) for k in [
+        'sizes', 'ratio', 'seed', 'repeats', 'run_repeats', 'population_size', 'children', 'evals', 'run_variables',
+        'run_args'])),
+    ('instances', collections.OrderedDict()),
+    ('runs', collections.OrderedDict()),
+])
+
+# Generated instances and the outputs of full runs only live as long as the benchmark
+scratch_directory = tempfile.mkdtemp(prefix='sat_benchmark_')
+try:
+    for name, filename in ladder(scratch_directory):
+        results['instances'][name] = benchmark_instance(name, filename)
+        if results['instances'][name]['variables'] <= args.run_variables:
+            results['runs'][name] = benchmark_run(name, filename, scratch_directory)
+finally:
+    shutil.rmtree(scratch_directory)
+
+with open(args.output, 'w') as f:
+    json.dump(results, f, indent=2)
+    f.write('\n')
+print('Results written to {0}'.format(args.output))
+
+if args.baseline:
+    with open(args.baseline) as f:
+        baseline = json.load(f, object_pairs_hook=collections.OrderedDict)
+    if baseline.get('version') != VERSION:
+        print('{0} was written by an incompatible version'.format(args.baseline))
+        sys.exit(1)
+    print('\nComparison with {0} (tolerance {1:.0%}, noise floor {2:g} s)'.format(args.baseline, args.tolerance,
+                                                                                 args.noise_floor))
+    regressions = compare(baseline, results, args.tolerance, args.noise_floor)
+    if regressions:
+        print('{0} regressions: {1}'.format(len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+    print('No regressions')
@@ -0,0 +1,62 @@
+"""
+Periodic snapshots of a job, so that an interrupted job can be resumed exactly where it stopped
+A checkpoint is a dictionary pickled with the highest protocol (numpy arrays are stored as raw bytes),
+ written to a temporary file which then replaces the previous checkpoint, so a crash never leaves a partial one
+"""
+
+import os
+import time
+import cPickle as pickle
+
+VERSION = 1
+
+
+class Checkpointer:
+    def __init__(self, filename, generations, seconds, flush_outputs):
+        """
+        A checkpoint is due every generations generations or seconds seconds, whichever comes first (0 disables either)
+        :param filename: string
+        :param generations: int
+        :param seconds: float
+        :param flush_outputs: function() -> dict, flushes every output file and returns their lengths by name
+        """
+        self.filename = filename
+        self.generations = generations
+        self.seconds = seconds
+        self.flush_outputs = flush_outputs
+        self.last_save = time.time()
+        # State of the job outside of the current run, kept up to date by the caller
+        self.state = dict()
+
+    def due(self, generation_index):
+        if self.generations and (generation_index + 1) % self.generations == 0:
+            return True
+        return bool(self.seconds) and time.time() - self.last_save >= self.seconds
+
+    def save(self, generation=None):
+        """
+        :param generation: dict, state of the current run, or None between runs
+        """
+        save(self.filename, dict(self.state, version=VERSION, generation=generation, outputs=self.flush_outputs()))
+        self.last_save = time.time()
+
+
+def save(filename, checkpoint):
+    temporary_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+    with open(temporary_filename, 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temporary_filename, filename)
+
+
+def load(filename):
+    """
+    :return: dict
+    :raises ValueError: if the checkpoint was written by an incompatible version
+    """
+    with open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != VERSION:
+        raise ValueError('{0} was written by an incompatible version'.format(filename))
+    return checkpoint
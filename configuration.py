@@ -2,6 +2,7 @@
 This file handles all command line and file configuration options to the program
 """
 
+import os
 import argparse
 import time
 import itertools
@@ -21,11 +22,22 @@ parser = argparse.ArgumentParser(description='Runs a (mu+lambda) EA to find a SA
                                  epilog='Use @more_args.txt to use command line options from a file with \n'
                                  'options on separate lines.')
 parser.add_argument('--cnf', '-c', dest='equation', default='equation.cnf', type=argparse.FileType('r'),
-                    required=True, help='Path to an existing CNF equation file.')
+                    required=True,
+                    help='Path to an existing CNF equation file (may be compressed as .gz, .bz2 or .xz, '
+                         'which needs the backports.lzma package).')
 parser.add_argument('--seed', '-s', dest='seed', default='time', type=str, required=False,
                     help='Seeds the random number generator, use \'time\' to use the current time.')
 parser.add_argument('--runs', '-r', dest='runs', default=30, type=int, required=False,
                     help='The number of runs of the algorithm.')
+parser.add_argument('--jobs', '-j', dest='jobs', default=1, type=int, required=False,
+                    help='The number of runs performed in parallel by worker processes, 0 uses every core.')
+parser.add_argument('--islands', dest='islands', default=1, type=int, required=False,
+                    help='The number of populations evolved in parallel processes within each run.  '
+                         'Each island has its own --evals and --terminate-pareto limits.')
+parser.add_argument('--migration-interval', dest='migration_interval', default=10, type=int, required=False,
+                    help='Islands exchange the members of their best pareto front every N generations.')
+parser.add_argument('--topology', dest='topology', choices=['ring', 'full'], default='ring',
+                    help='Which islands receive an island\'s emigrants, the next island or every other island.')
 parser.add_argument('--population-size', '-p', dest='population_size', default=100, type=int, required=False,
                     help='The maximum number of organisms before reproduction.')
 parser.add_argument('--children', '-i', dest='children', default=10, type=int, required=False,
@@ -50,8 +62,46 @@ parser.add_argument('--terminate-pareto', dest='terminate_pareto', default=-1, t
                          '  -1 disables this.')
 parser.add_argument('--seed-file', dest='seed_file', default=None, type=argparse.FileType('r'),
                     help='Seed the organism pool with solutions from a file.')
+parser.add_argument('--crossover', dest='crossover', choices=['one-point', 'two-point', 'uniform'],
+                    default='one-point', help='The recombination operator.')
+parser.add_argument('--mutation', dest='mutation', choices=['flip', 'sparse', 'swap'], default='flip',
+                    help='The mutation operator.  flip and sparse both replace every gene with a random value with '
+                         'probability 1/n, sparse only samples the genes which change, which is faster on large '
+                         'instances but draws different random numbers, so seeded runs give different results.  '
+                         'swap swaps two genes.')
+parser.add_argument('--local-search', dest='local_search', choices=['none', 'walksat', 'gsat'], default='none',
+                    help='Improve children before survival by repeatedly satisfying a random unsatisfied clause, '
+                         'setting the variable which breaks the fewest clauses (walksat) or gains the most (gsat).  '
+                         'The literals examined are counted against --evals as fractions of an evaluation.')
+parser.add_argument('--local-search-steps', dest='local_search_steps', default=20, type=int, required=False,
+                    help='Maximum number of variables set by --local-search per child.')
+parser.add_argument('--local-search-noise', dest='local_search_noise', default=0.5, type=float, required=False,
+                    help='Probability of a --local-search step setting a random variable of the clause instead.')
+parser.add_argument('--local-search-rate', dest='local_search_rate', default=1.0, type=float, required=False,
+                    help='Probability of each child being improved by --local-search.')
 parser.add_argument('--survival-strategy', dest='survival_strategy', choices=['comma', 'plus'], default='plus',
                     help='The survival strategy to use.  (mu [+|,] lambda)')
+parser.add_argument('--cache', dest='cache', action='store_true', default=False,
+                    help='Keep a memory-mappable binary copy of the parsed CNF file so later runs skip parsing.')
+parser.add_argument('--cache-directory', dest='cache_directory', default=None, type=str, required=False,
+                    help='Directory for --cache entries.  Defaults to the directory of the CNF file.')
+parser.add_argument('--preprocess', dest='preprocess', action='store_true', default=False,
+                    help='Simplify the equation before solving it (unit propagation, pure literals, tautologies, '
+                         'duplicate and subsumed clauses, unused variables).  Solutions are still written and scored '
+                         'in terms of the original equation.')
+parser.add_argument('--incremental', dest='incremental', action='store_true', default=False,
+                    help='Score children by re-evaluating only the clauses touched by the variables that differ from '
+                         'their closest parent.')
+parser.add_argument('--evaluation-workers', dest='evaluation_workers', default=0, type=int, required=False,
+                    help='Score offspring batches in N worker processes sharing the equation through shared memory.  '
+                         '0 scores them in-process.')
+parser.add_argument('--evaluation-threshold', dest='evaluation_threshold', default=32, type=int, required=False,
+                    help='Batches with fewer organisms than this are scored in-process even with --evaluation-workers.')
+parser.add_argument('--fitness-cache', dest='fitness_cache', default=0, type=float, required=False,
+                    help='Remember the objectives of up to this many megabytes of genomes so that genomes generated '
+                         'again are not evaluated again, evicting the least recently used.  0 disables the cache.')
+parser.add_argument('--free-cache-hits', dest='free_cache_hits', action='store_true', default=False,
+                    help='Do not count --fitness-cache hits against --evals.')
 # Use 'a' (append) mode so that we don't truncate existing files while trying to open multiple files
 #  (For example, if you specified a filename in a config file, and also on the command line, it would try to open
 #   both files, truncating both, even though we only wanted to open the latter one, but we still want to report an
@@ -59,26 +109,74 @@ parser.add_argument('--survival-strategy', dest='survival_strategy', choices=['c
 # TODO: Change the argparse class to interpret multiple filename arguments correctly
 parser.add_argument('--log', '-l', dest='log', default='log.txt', type=argparse.FileType('a'), required=False,
                     help='Path to a log file to be generated.')
+parser.add_argument('--log-format', dest='log_format', choices=['text', 'binary'], default='text',
+                    help='Format of the log file.  binary writes fixed-width records which plot.py loads much faster.')
+parser.add_argument('--log-flush-interval', dest='log_flush_interval', default=4096, type=int, required=False,
+                    help='Number of records a binary log collects before writing them.')
+parser.add_argument('--checkpoint', dest='checkpoint', default=None, type=str, required=False,
+                    help='Path of a checkpoint file, rewritten periodically so that an interrupted job can be '
+                         'resumed with --resume.  It is removed once the job finishes.')
+parser.add_argument('--checkpoint-generations', dest='checkpoint_generations', default=100, type=int, required=False,
+                    help='Write a checkpoint every N generations.  0 disables this.')
+parser.add_argument('--checkpoint-seconds', dest='checkpoint_seconds', default=0, type=float, required=False,
+                    help='Write a checkpoint whenever T seconds have passed since the previous one.  0 disables this.')
+parser.add_argument('--resume', dest='resume', action='store_true', default=False,
+                    help='Continue the job saved in --checkpoint, if it exists, appending to its output files.  '
+                         'All other options must be the same as when the job was started.')
 parser.add_argument('--solution', '-u', dest='solution', default='solution.txt', type=argparse.FileType('a'),
                     required=False, help='Path to a solution file to be generated.')
 parser.add_argument('--pareto', default=None, type=argparse.FileType('a'),
                     required=False, help='Path to file to be generated containing best pareto fronts from all runs.')
 parser.add_argument('--diversity', default=None, type=argparse.FileType('a'), required=False,
                     help='Path to file to be generated containing the diversity measure for all generations.')
+parser.add_argument('--diversity-measure', dest='diversity_measure', choices=['spread', 'hamming', 'entropy'],
+                    default='spread',
+                    help='spread: how evenly the best pareto front covers the objective space.  '
+                         'hamming: mean Hamming distance between every pair of genomes.  '
+                         'entropy: mean Shannon entropy (in bits) of the values of every gene.')
+parser.add_argument('--diversity-interval', dest='diversity_interval', default=1, type=int, required=False,
+                    help='Measure the diversity every N generations, the other generations are written as nan.')
+parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+                    help='Time every phase of the generation loop and print the times, evaluations per second and '
+                         'peak memory use at the end of every run.')
+parser.add_argument('--profile-output', dest='profile_output', default=None, type=argparse.FileType('a'),
+                    required=False, help='Path to file to be generated containing the --profile times of every run, '
+                                         'one JSON object per line.  Implies --profile.')
 
 args = parser.parse_args()
 
-# Reopen output files as 'w'
+if args.islands > 1 and args.jobs != 1:
+    parser.error('--islands can not be combined with --jobs, island processes can not be started by worker processes')
+if args.evaluation_workers and args.jobs != 1:
+    parser.error('--evaluation-workers can not be combined with --jobs, worker processes can not start their own pools')
+if args.evaluation_workers and args.incremental:
+    parser.error('--evaluation-workers can not be combined with --incremental')
+if args.fitness_cache and args.incremental:
+    parser.error('--fitness-cache can not be combined with --incremental, which needs the clause counts of every child')
+if args.diversity_interval < 1:
+    parser.error('--diversity-interval must be at least 1')
+if args.resume and not args.checkpoint:
+    parser.error('--resume requires --checkpoint')
+if args.checkpoint and (args.jobs != 1 or args.islands > 1):
+    parser.error('--checkpoint can not be combined with --jobs or --islands')
+
+# Reopen output files as 'w', or as 'a' when resuming, the outputs are then cut back to their checkpointed lengths
+args.resuming = args.resume and os.path.exists(args.checkpoint)
+mode = 'a' if args.resuming else 'w'
 args.log.close()
-args.log = open(args.log.name, 'w')
+args.log = open(args.log.name, mode + ('b' if args.log_format == 'binary' else ''))
 args.solution.close()
-args.solution = open(args.solution.name, 'w')
+args.solution = open(args.solution.name, mode)
 if args.pareto:
     args.pareto.close()
-    args.pareto = open(args.pareto.name, 'w')
+    args.pareto = open(args.pareto.name, mode)
 if args.diversity:
     args.diversity.close()
-    args.diversity = open(args.diversity.name, 'w')
+    args.diversity = open(args.diversity.name, mode)
+if args.profile_output:
+    args.profile_output.close()
+    args.profile_output = open(args.profile_output.name, mode)
+    args.profile = True
 
 # Simplify choices
 args.parent_selection = parent_selection_models.get(args.parent_selection, None) or args.parent_selection
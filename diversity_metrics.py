@@ -0,0 +1,76 @@
+"""
+Vectorized measures of how diverse a population is, in objective space and in genome space
+Genome measures work on 2d arrays of -1, 0 and 1, with one genome per row
+"""
+
+import numpy
+
+# Every value a gene can take
+GENE_VALUES = (-1, 0, 1)
+
+
+def front_spread(points, mins, maxs):
+    """
+    Calculates the normalized hyper-volume between each point on a Pareto front and its neighbors
+    Returns the percentage of the total normalized volume NOT taken up by these volumes
+        A higher return value corresponds to a better distributed Pareto front
+    :param points: numpy.array, one row per point of the (non-empty) front, one column per objective
+    :param mins: list, the minimum possible value of every objective
+    :param maxs: list, the maximum possible value of every objective
+    :return: float
+    """
+    points = numpy.asarray(points)
+    # The hyper-volume between every point and its lower neighbors, plus the one between the last point and the maxs
+    volumes = numpy.ones(shape=len(points))
+    max_volume = 1.0
+    for objective in range(points.shape[1]):
+        span = float(maxs[objective] - mins[objective])
+        # A stable sort breaks ties the same way as sorting the points one at a time
+        order = numpy.argsort(points[:, objective], kind='mergesort')
+        values = points[order, objective]
+        volumes[order] *= numpy.diff(numpy.concatenate(([mins[objective]], values))) / span
+        max_volume *= (maxs[objective] - values[-1]) / span
+    return float(1.0 - (numpy.sum(volumes) + max_volume))
+
+
+def value_counts(genomes):
+    """
+    :param genomes: numpy.array
+    :return: numpy.array, axis 0: one row per value of GENE_VALUES, axis 1: genes, how many genomes have that value
+    """
+    genomes = numpy.asarray(genomes)
+    return numpy.stack([numpy.count_nonzero(genomes == value, axis=0) for value in GENE_VALUES])
+
+
+def mean_hamming_distance(genomes):
+    """
+    Mean Hamming distance over every pair of genomes, in time linear in the size of the population
+    Of the n * (n - 1) / 2 pairs, a gene differs in all but those whose genomes have the same value,
+     so the distance summed over every pair follows from how many genomes have each value
+    :param genomes: numpy.array
+    :return: float
+    """
+    size = len(genomes)
+    if size < 2:
+        return 0.0
+    counts = value_counts(genomes).astype(numpy.int64)
+    differing_pairs = size * size * counts.shape[1] - numpy.sum(counts * counts)
+    return float(differing_pairs) / (size * (size - 1))
+
+
+def gene_entropy(genomes):
+    """
+    :param genomes: numpy.array
+    :return: numpy.array, the Shannon entropy (in bits) of the values of every gene, log2(3) being the most diverse
+    """
+    frequencies = value_counts(genomes) / float(max(len(genomes), 1))
+    logs = numpy.log2(numpy.where(frequencies > 0, frequencies, 1.0))
+    return -numpy.sum(frequencies * logs, axis=0)
+
+
+def mean_gene_entropy(genomes):
+    """
+    :param genomes: numpy.array
+    :return: float
+    """
+    return float(numpy.mean(gene_entropy(genomes)))
@@ -0,0 +1,180 @@
+"""
+An on-disk cache of parsed equations
+Each entry is one raw file that can be memory-mapped without any parsing or copying:
+ a fixed size JSON header padded to HEADER_SIZE bytes, followed by the CSR arrays of the equation
+Entries are keyed by a hash of the CNF file contents, so edited CNF files are never served stale data
+The header holds a checksum of every array, an entry which fails it (or any other check) is treated as a miss
+ and rebuilt
+"""
+
+import os
+import json
+import glob
+import hashlib
+import zlib
+
+import numpy
+
+import reader
+import sat_core
+
+MAGIC = 'sat_solver equation cache 2'
+HEADER_SIZE = 4096
+ALIGNMENT = 64
+EXTENSION = '.eqcache'
+
+# Name and dtype of every array stored in an entry, in file order
+ARRAYS = [
+    ('clause_offsets', numpy.int64),
+    ('literal_variables', numpy.int32),
+    ('literal_values', numpy.int8),
+]
+
+
+def hash_file(filename, chunk_size=2 ** 22):
+    """
+    :param filename: string
+    :return: string, hex digest of the file contents
+    """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checksum(array):
+    """
+    :param array: numpy.array
+    :return: int, CRC-32 of the bytes of the array
+    """
+    return zlib.crc32(numpy.ascontiguousarray(array).view(numpy.uint8)) & 0xffffffff
+
+
+def entry_filename(filename, content_hash, cache_directory=None):
+    """
+    Entries are placed next to the CNF file unless a cache directory is given
+    """
+    directory = cache_directory or os.path.dirname(os.path.abspath(filename))
+    return os.path.join(directory, '{0}.{1}{2}'.format(os.path.basename(filename), content_hash[:16], EXTENSION))
+
+
+def save(equation, path, content_hash):
+    """
+    Writes an equation to a cache entry, atomically replacing any existing entry
+    :param equation: sat_core.Equation
+    :param path: string
+    :param content_hash: string
+    """
+    header = {
+        'magic': MAGIC,
+        'content_hash': content_hash,
+        'number_of_variables': equation.number_of_variables,
+        'arrays': list(),
+    }
+    offset = HEADER_SIZE
+    for name, dtype in ARRAYS:
+        array = getattr(equation, name)
+        header['arrays'].append({'name': name, 'offset': offset, 'length': len(array),
+                                 'checksum': checksum(numpy.asarray(array, dtype=dtype))})
+        offset += -(-len(array) * numpy.dtype(dtype).itemsize // ALIGNMENT) * ALIGNMENT
+    header['size'] = offset
+    encoded_header = json.dumps(header).encode('ascii')
+    if len(encoded_header) >= HEADER_SIZE:
+        raise ValueError('Cache header does not fit in {0} bytes'.format(HEADER_SIZE))
+
+    temporary_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as f:
+        f.write(encoded_header.ljust(HEADER_SIZE, b' '))
+        for (name, dtype), description in zip(ARRAYS, header['arrays']):
+            f.seek(description['offset'])
+            f.write(numpy.ascontiguousarray(getattr(equation, name), dtype=dtype).tobytes())
+        f.truncate(header['size'])
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(temporary_path, path)
+
+
+def load(path, content_hash):
+    """
+    Memory-maps a cache entry
+    :param path: string
+    :param content_hash: string
+    :return: sat_core.Equation, or None if the entry is missing, stale or corrupted
+    """
+    try:
+        return verified_load(path, content_hash)
+    except Exception:
+        # Whatever a damaged entry breaks, it is rebuilt from the CNF file
+        return None
+
+
+def verified_load(path, content_hash):
+    """
+    :return: sat_core.Equation, or None if the entry is missing, stale or corrupted
+    :raises: any exception a corrupted entry may cause
+    """
+    with open(path, 'rb') as f:
+        header = json.loads(f.read(HEADER_SIZE).decode('ascii'))
+    if header['magic'] != MAGIC or header['content_hash'] != content_hash:
+        return None
+    if os.path.getsize(path) != header['size']:
+        return None
+    arrays = dict()
+    for (name, dtype), description in zip(ARRAYS, header['arrays']):
+        if description['name'] != name:
+            return None
+        if description['length']:
+            arrays[name] = numpy.memmap(path, dtype=dtype, mode='r', offset=description['offset'],
+                                        shape=(description['length'],))
+        else:
+            arrays[name] = numpy.zeros(shape=0, dtype=dtype)
+        if checksum(arrays[name]) != description['checksum']:
+            return None
+
+    # The checksums catch damaged bytes, these catch entries which were written wrong
+    clause_offsets = arrays['clause_offsets']
+    literal_variables = arrays['literal_variables']
+    literal_values = arrays['literal_values']
+    number_of_literals = len(literal_variables)
+    if (not len(clause_offsets) or clause_offsets[0] != 0 or clause_offsets[-1] != number_of_literals or
+            len(literal_values) != number_of_literals):
+        return None
+    if numpy.any(numpy.diff(clause_offsets) < 0):
+        return None
+    if number_of_literals and (literal_variables.min() < 0 or
+                               literal_variables.max() >= header['number_of_variables'] or
+                               literal_values.min() < 0 or literal_values.max() > 1):
+        return None
+    return sat_core.Equation(header['number_of_variables'], clause_offsets, arrays['literal_variables'],
+                             arrays['literal_values'])
+
+
+def read_DIMACS_cached(filename, cache_directory=None):
+    """
+    Loads an equation from the cache, parsing the DIMACS file and (re)building the entry on a miss
+    :param filename: string
+    :param cache_directory: string, defaults to the directory of the CNF file
+    :return: (sat_core.Equation, bool) the equation and whether it came from the cache
+    """
+    content_hash = hash_file(filename)
+    path = entry_filename(filename, content_hash, cache_directory)
+    equation = load(path, content_hash)
+    if equation is not None:
+        return equation, True
+
+    with reader.open_DIMACS(filename) as f:
+        equation = reader.read_DIMACS_stream(f)
+    # Remove entries of older versions of this file
+    for stale_path in glob.glob(entry_filename(filename, '*' * 16, cache_directory).replace('*' * 16, '*')):
+        if stale_path != path:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+    try:
+        save(equation, path, content_hash)
+    except (IOError, OSError):
+        # The cache is only an optimization, carry on if it can not be written
+        pass
+    return equation, False
@@ -0,0 +1,89 @@
+"""
+Parallel fitness evaluation of large batches of organisms
+The clause arrays, an offspring buffer and an objective buffer are placed in anonymous shared memory before the worker
+ processes are forked, so neither the equation nor the organisms are ever pickled; workers only receive slice bounds
+"""
+
+import mmap
+import multiprocessing
+
+import numpy
+
+import sat_core
+
+# State inherited by worker processes when the pool forks: (equation, genomes, objectives)
+shared_state = None
+
+
+def share_array(array):
+    """
+    Copies an array into anonymous shared memory, which forked processes see without copying
+    :param array: numpy.array
+    :return: numpy.array
+    """
+    array = numpy.asarray(array)
+    buffer = mmap.mmap(-1, max(array.nbytes, 1))
+    shared = numpy.frombuffer(buffer, dtype=array.dtype, count=array.size).reshape(array.shape)
+    shared[...] = array
+    return shared
+
+
+def share_equation(equation):
+    """
+    :param equation: sat_core.Equation
+    :return: sat_core.Equation, with its clause arrays in shared memory
+    """
+    return sat_core.Equation(equation.number_of_variables, share_array(equation.clause_offsets),
+                             share_array(equation.literal_variables), share_array(equation.literal_values))
+
+
+def evaluate_slice(bounds):
+    """
+    Scores the organisms genomes[start:stop] of the shared buffer in a worker process
+    """
+    start, stop = bounds
+    equation, genomes, objectives = shared_state
+    objectives[0, start:stop] = equation.evaluate(genomes[start:stop])
+    objectives[1, start:stop] = equation.count_free_variables(genomes[start:stop])
+
+
+class EvaluationPool:
+    def __init__(self, equation, processes, capacity, threshold):
+        """
+        :param equation: sat_core.Equation
+        :param processes: int, number of worker processes
+        :param capacity: int, largest batch scored in one dispatch, larger batches are split
+        :param threshold: int, batches smaller than this are scored in-process
+        """
+        global shared_state
+        self.equation = share_equation(equation)
+        self.processes = processes
+        self.threshold = threshold
+        self.genomes = share_array(numpy.zeros(shape=(capacity, equation.number_of_variables), dtype=numpy.int8))
+        self.objectives = share_array(numpy.zeros(shape=(2, capacity), dtype=numpy.int64))
+        shared_state = (self.equation, self.genomes, self.objectives)
+        self.pool = multiprocessing.Pool(processes)
+
+    def evaluate(self, organisms):
+        """
+        :param organisms: numpy.array
+        :return: (numpy.array, numpy.array) fitnesses and numbers of free variables
+        """
+        if len(organisms) < self.threshold:
+            return self.equation.evaluate(organisms), self.equation.count_free_variables(organisms)
+        capacity = len(self.genomes)
+        fitnesses = numpy.empty(shape=len(organisms), dtype=numpy.int64)
+        simplicities = numpy.empty(shape=len(organisms), dtype=numpy.int64)
+        for start in range(0, len(organisms), capacity):
+            batch = organisms[start:start + capacity]
+            self.genomes[:len(batch)] = batch
+            # Split the batch evenly over the workers
+            edges = numpy.linspace(0, len(batch), self.processes + 1).astype(int)
+            self.pool.map(evaluate_slice, [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a])
+            fitnesses[start:start + len(batch)] = self.objectives[0, :len(batch)]
+            simplicities[start:start + len(batch)] = self.objectives[1, :len(batch)]
+        return fitnesses, simplicities
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
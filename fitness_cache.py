@@ -0,0 +1,71 @@
+"""
+A bounded cache of fitness values, so genomes which are generated again are not evaluated again
+Genomes are keyed by their bytes, so a lookup only hits the entry of an identical genome
+"""
+
+import collections
+
+import numpy
+
+import populations
+
+# Approximate memory used by one entry (key string header, value tuple and ordered dictionary node)
+#  on top of the bytes of its genome
+ENTRY_BYTES = 256
+
+
+class FitnessCache:
+    def __init__(self, number_of_variables, megabytes):
+        """
+        :param number_of_variables: int, length of every genome
+        :param megabytes: float, memory bound of the cache, the least recently used entries are evicted beyond it
+        """
+        entry_bytes = ENTRY_BYTES + number_of_variables * numpy.dtype(populations.GENOME_DTYPE).itemsize
+        self.capacity = max(int(megabytes * 2 ** 20) // entry_bytes, 1)
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def keys(self, organisms):
+        """
+        :param organisms: numpy.array
+        :return: list of string, the key of each organism
+        """
+        return [organism.tobytes() for organism in numpy.asarray(organisms, dtype=populations.GENOME_DTYPE)]
+
+    def evaluate(self, organisms, evaluate):
+        """
+        Looks up the objectives of organisms, calling evaluate on the ones which are not cached
+        A genome repeated within organisms is only evaluated once, its repetitions count as hits
+        :param organisms: numpy.array
+        :param evaluate: function(organisms) -> (numpy.array, numpy.array) fitnesses and numbers of free variables
+        :return: (numpy.array, numpy.array, int) fitnesses, numbers of free variables and number of misses
+        """
+        keys = self.keys(organisms)
+        fitnesses = numpy.empty(shape=len(organisms), dtype=numpy.int64)
+        simplicities = numpy.empty(shape=len(organisms), dtype=numpy.int64)
+        entries = self.entries
+        missing = collections.OrderedDict()
+        for index, key in enumerate(keys):
+            entry = entries.pop(key, None)
+            if entry is None:
+                missing.setdefault(key, list()).append(index)
+            else:
+                # Reinserting moves the entry to the most recently used end
+                entries[key] = entry
+                fitnesses[index], simplicities[index] = entry
+
+        if missing:
+            first_indices = [indices[0] for indices in missing.itervalues()]
+            missing_fitnesses, missing_simplicities = evaluate(organisms[first_indices])
+            for (key, indices), fitness, simplicity in zip(missing.iteritems(), missing_fitnesses.tolist(),
+                                                           missing_simplicities.tolist()):
+                entries[key] = (fitness, simplicity)
+                fitnesses[indices] = fitness
+                simplicities[indices] = simplicity
+            while len(entries) > self.capacity:
+                entries.popitem(last=False)
+
+        self.misses += len(missing)
+        self.hits += len(organisms) - len(missing)
+        return fitnesses, simplicities, len(missing)
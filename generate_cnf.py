@@ -1,40 +1,131 @@
 __author__ = 'Tarnasa'
 
 import argparse
-import random
 import os
 
+import numpy
+
 
 parser = argparse.ArgumentParser(
     description='Generate a cnf file and an associated configuration file for use with run.py.')
 
 parser.add_argument('--name', '-n', dest='name', default='generated_cnf', type=str, required=False,
                     help="The name of the CNF set, will be used in file names.")
+parser.add_argument('--directory', '-d', dest='directory', default='', type=str, required=False,
+                    help="Directory to place the CNF set and its configuration file in.  "
+                         "Defaults to the current directory.")
 parser.add_argument('--variables', '-v', dest='number_of_variables', default=5, type=int, required=False,
                     help="Number of variable.")
 parser.add_argument('--clauses', '-c', dest='number_of_clauses', default=5, type=int, required=False,
                     help="Number of clauses.")
+parser.add_argument('--ratio', '-r', dest='ratio', default=None, type=float, required=False,
+                    help="Number of clauses per variable, overrides --clauses.  "
+                         "Uniform random 3-SAT is hardest around 4.26.")
+parser.add_argument('--family', '-f', dest='family', choices=['gaussian', 'uniform', 'planted'], default='gaussian',
+                    help="gaussian: clauses of random lengths favoring small sizes.  "
+                         "uniform: uniform random k-SAT, every clause has k distinct variables with random signs.  "
+                         "planted: uniform random k-SAT keeping only clauses satisfied by a hidden random "
+                         "assignment, which is written to NAME.planted in the format of --seed-file.")
+parser.add_argument('--literals', '-k', dest='k', default=3, type=int, required=False,
+                    help="Number of literals per clause of the uniform and planted families.")
+parser.add_argument('--seed', '-s', dest='seed', default=None, type=int, required=False,
+                    help="Random number seed, the same seed and options always generate the same files.  "
+                         "Defaults to a random seed.")
+parser.add_argument('--chunk-size', dest='chunk_size', default=65536, type=int, required=False,
+                    help="Number of clauses generated and written at a time.")
 
 args = parser.parse_args()
 
-if not os.path.exists('{0}'.format(args.name)):
-    os.makedirs('{0}'.format(args.name))
-with open('{0}/{0}.cnf'.format(args.name), 'w') as cnf:
+if args.ratio is not None:
+    args.number_of_clauses = int(round(args.ratio * args.number_of_variables))
+if args.family != 'gaussian' and not 1 <= args.k <= args.number_of_variables:
+    parser.error('--literals must be between 1 and the number of variables')
+
+random_state = numpy.random.RandomState(args.seed)
+
+# Most random numbers held at once when variables are drawn through random permutations
+PERMUTATION_BLOCK = 2 ** 20
+
+
+def distinct_variables(number_of_clauses, number_of_variables, k):
+    """
+    :return: numpy.array, number_of_clauses rows of k distinct (0-based) variables, every row drawn uniformly
+    """
+    if k * (k - 1) > 4 * number_of_variables:
+        # Rows would repeat a variable too often to redraw them, take the first k of random permutations instead,
+        #  permuting a block of rows at a time
+        rows = max(PERMUTATION_BLOCK // number_of_variables, 1)
+        return numpy.concatenate([numpy.argsort(random_state.random_sample(
+            size=(min(rows, number_of_clauses - start), number_of_variables)), axis=1)[:, :k]
+            for start in range(0, number_of_clauses, rows)])
+    # A row repeats a variable with probability about 1 - exp(-k (k - 1) / 2n), at most 1 - exp(-2) here,
+    #  so only a few rounds of redrawing the rows which do are needed
+    variables = random_state.randint(0, number_of_variables, size=(number_of_clauses, k))
+    while True:
+        ordered = numpy.sort(variables, axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not repeated.any():
+            return variables
+        variables[repeated] = random_state.randint(0, number_of_variables, size=(numpy.count_nonzero(repeated), k))
+
+
+def write_fixed_length_clauses(cnf, solution=None):
+    """
+    Streams uniform random k-SAT clauses to cnf a chunk at a time
+    :param solution: numpy.array, if given only clauses satisfied by this assignment of 0s and 1s are kept
+    """
+    for start in range(0, args.number_of_clauses, args.chunk_size):
+        size = min(args.chunk_size, args.number_of_clauses - start)
+        variables = distinct_variables(size, args.number_of_variables, args.k)
+        values = random_state.randint(0, 2, size=(size, args.k))
+        if solution is not None:
+            # The signs are independent of the variables, so redrawing the signs of unsatisfied clauses keeps every
+            #  satisfied clause equally likely
+            while True:
+                unsatisfied = ~(values == solution[variables]).any(axis=1)
+                if not unsatisfied.any():
+                    break
+                values[unsatisfied] = random_state.randint(0, 2, size=(numpy.count_nonzero(unsatisfied), args.k))
+        literals = (variables + 1) * (2 * values - 1)
+        numpy.savetxt(cnf, numpy.column_stack((literals, numpy.zeros(shape=size, dtype=int))), fmt='%d')
+
+
+def write_gaussian_clauses(cnf):
+    """
+    Streams clauses with a random number of literals favoring small sizes to cnf
+    """
+    for start in range(0, args.number_of_clauses, args.chunk_size):
+        size = min(args.chunk_size, args.number_of_clauses - start)
+        lengths = random_state.normal(0.2 * args.number_of_variables, args.number_of_variables * 0.3, size=size)
+        lengths = numpy.clip(lengths.astype(int), 1, args.number_of_variables)
+        for length in lengths:
+            variables = numpy.sort(random_state.permutation(args.number_of_variables)[:length]) + 1
+            literals = variables * (2 * random_state.randint(0, 2, size=length) - 1)
+            cnf.write(' '.join(map(str, literals)) + ' 0\n')
+
+
+prefix = os.path.join(args.directory, args.name)
+if not os.path.exists(prefix):
+    os.makedirs(prefix)
+solution = None
+if args.family == 'planted':
+    solution = random_state.randint(0, 2, size=args.number_of_variables)
+    with open('{0}/{1}.planted'.format(prefix, args.name), 'w') as planted:
+        planted.write('c Planted solution for: {0}/{1}.cnf\n'.format(prefix, args.name))
+        planted.write('v {0}\n'.format(' '.join(str((i + 1) * [-1, 1][x]) for i, x in enumerate(solution))))
+# Clauses are written through a large buffer, the file is never held in memory
+with open('{0}/{1}.cnf'.format(prefix, args.name), 'w', 2 ** 20) as cnf:
     cnf.write('c {0} CNF file\n'.format(args.name))
+    cnf.write('c family: {args.family}, literals: {args.k}, seed: {args.seed}\n'.format(**locals()))
     cnf.write('p cnf {0} {1}\n'.format(args.number_of_variables, args.number_of_clauses))
-    for clause_index in range(args.number_of_clauses):
-        # Use a random number of literals in the clause favoring small sizes
-        number_of_literals = random.gauss(0.2 * args.number_of_variables, args.number_of_variables * 0.3)
-        number_of_literals = min(max(int(number_of_literals), 1), args.number_of_variables)
-        literal_mask = [random.choice([-1, 1]) for _ in range(number_of_literals)] +\
-                       [False] * (args.number_of_variables - number_of_literals)
-        random.shuffle(literal_mask)
-        cnf.write(' '.join(str(x * literal_mask[x]) for x in range(args.number_of_variables) if literal_mask[x]) +
-                  ' 0\n')
-
-with open('{0}.args'.format(args.name), 'w') as config:
+    if args.family == 'gaussian':
+        write_gaussian_clauses(cnf)
+    else:
+        write_fixed_length_clauses(cnf, solution)
+
+with open('{0}.args'.format(prefix), 'w') as config:
     config.write("""--cnf
-{args.name}/{args.name}.cnf
+{prefix}/{args.name}.cnf
 --seed
 int
 --runs
@@ -42,7 +133,7 @@ int
 --evals
 10000
 --log
-{args.name}/log.txt
+{prefix}/log.txt
 --solution
-{args.name}/solution.txt
+{prefix}/solution.txt
 """.format(**locals()))
@@ -0,0 +1,101 @@
+"""
+Local search operators which improve a batch of individuals in place before they are evaluated
+Each step picks a random unsatisfied clause and satisfies it by setting one of its variables,
+ only the clauses containing that clause's variables are examined, through the equation's occurrence index
+Each improve function returns the work it did as a number of (full) fitness evaluations, so it can be counted
+"""
+
+import numpy
+
+
+def walksat(equation, steps, noise, rate, greedy=False):
+    """
+    :param equation: sat_core.Equation
+    :param steps: int, maximum number of variables set per individual
+    :param noise: float, probability of setting a random variable of the clause instead of the best one
+    :param rate: float, probability of each individual being improved
+    :param greedy: bool, pick the variable with the best net gain (GSAT) instead of the fewest broken clauses (WalkSAT)
+    """
+    clause_offsets = equation.clause_offsets
+    literal_variables = equation.literal_variables
+    literal_values = equation.literal_values
+    literal_clauses = equation.literal_clauses
+    clause_lengths = numpy.diff(clause_offsets)
+
+    def search(individual):
+        """
+        Improves one individual in place, keeping the best assignment seen
+        :return: int, number of literals examined
+        """
+        counts = equation.true_literal_counts(individual[numpy.newaxis, :])[0]
+        # Unsatisfiable empty clauses are never picked
+        unsatisfied = numpy.flatnonzero((counts == 0) & (clause_lengths > 0)).tolist()
+        positions = numpy.full(equation.number_of_clauses, -1, dtype=numpy.int64)
+        positions[unsatisfied] = numpy.arange(len(unsatisfied))
+        fitness = best_fitness = numpy.count_nonzero(counts)
+        # (variable, previous value) of every change made since the best assignment
+        changes = list()
+        examined = equation.number_of_literals
+        for _ in range(steps):
+            if not unsatisfied:
+                break
+            clause = unsatisfied[numpy.random.randint(len(unsatisfied))]
+            variables = literal_variables[clause_offsets[clause]:clause_offsets[clause + 1]]
+            new_values = literal_values[clause_offsets[clause]:clause_offsets[clause + 1]]
+
+            if numpy.random.random() < noise:
+                choice = numpy.random.randint(len(variables))
+            else:
+                # Count the clauses each candidate would break (only true literal lost) and make (first true literal)
+                literals = equation.occurrences(variables)
+                repeats = equation.occurrence_offsets[variables + 1] - equation.occurrence_offsets[variables]
+                owners = numpy.repeat(numpy.arange(len(variables)), repeats)
+                occurrence_values = literal_values[literals]
+                true_before = occurrence_values == numpy.repeat(individual[variables], repeats)
+                true_after = occurrence_values == numpy.repeat(new_values, repeats)
+                clause_counts = counts[literal_clauses[literals]]
+                breaks = numpy.bincount(owners, weights=true_before & ~true_after & (clause_counts == 1),
+                                        minlength=len(variables))
+                examined += len(literals)
+                if greedy:
+                    makes = numpy.bincount(owners, weights=~true_before & true_after & (clause_counts == 0),
+                                           minlength=len(variables))
+                    choice = numpy.argmax(makes - breaks)
+                else:
+                    choice = numpy.argmin(breaks)
+
+            variable = variables[choice]
+            changes.append((variable, individual[variable]))
+            fitness += equation.update_true_literal_counts(counts, variables[choice:choice + 1],
+                                                           individual[variable:variable + 1], new_values[choice:choice + 1])
+            individual[variable] = new_values[choice]
+
+            # Move the clauses of the variable whose status changed in or out of the unsatisfied list
+            touched = literal_clauses[equation.occurrences(variables[choice:choice + 1])]
+            examined += 2 * len(touched)
+            for touched_clause in numpy.unique(touched).tolist():
+                position = positions[touched_clause]
+                if counts[touched_clause] and position >= 0:
+                    last = unsatisfied.pop()
+                    if last != touched_clause:
+                        unsatisfied[position] = last
+                        positions[last] = position
+                    positions[touched_clause] = -1
+                elif not counts[touched_clause] and position < 0:
+                    positions[touched_clause] = len(unsatisfied)
+                    unsatisfied.append(touched_clause)
+
+            if fitness > best_fitness:
+                best_fitness = fitness
+                del changes[:]
+
+        for variable, value in reversed(changes):
+            individual[variable] = value
+        return examined
+
+    def improve(individuals):
+        chosen = numpy.flatnonzero(numpy.random.random(size=len(individuals)) < rate)
+        examined = sum(search(individuals[index]) for index in chosen)
+        # A full evaluation examines every literal once
+        return -(-examined // max(equation.number_of_literals, 1))
+    return improve
@@ -0,0 +1,205 @@
+"""
+Writers and loaders of the per-generation statistics log
+Two formats are supported:
+ text: the configuration header, then one 'Run N' section per run with one tab separated line per generation
+  and notes (such as the fitness cache counters) as free text lines
+ binary: MAGIC, the length of a JSON header (8 bytes, little endian), the JSON header, then frames,
+  each one a kind byte, the length of its payload (8 bytes, little endian) and the payload:
+  RECORDS_FRAME: fixed-width RECORDs, NOTE_FRAME: the JSON {"run": run index, "note": text} of a note
+Both are loaded into one array of RECORDs by load, and their notes by load_notes
+"""
+
+import re
+import json
+import struct
+
+import numpy
+
+MAGIC = b'SATLOG1\n'
+RECORDS_FRAME = b'R'
+NOTE_FRAME = b'N'
+
+# One record per generation of every run, the diversity is NaN when it is not measured
+RECORD = numpy.dtype([('run', '<i4'), ('evals', '<i8'), ('fitness_mean', '<f8'), ('fitness_best', '<i8'),
+                      ('simplicity_mean', '<f8'), ('simplicity_best', '<i8'), ('diversity', '<f8')])
+
+
+class TextLog:
+    def __init__(self, f):
+        """
+        :param f: file
+        """
+        self.f = f
+
+    def write_header(self, header):
+        self.f.write(header)
+
+    def start_run(self, run_index):
+        self.f.write('\nRun {0}\n'.format(run_index + 1))
+
+    def resume_run(self, run_index):
+        """
+        Continues a run whose start was already written
+        """
+        pass
+
+    def write_record(self, evals, fitness_mean, fitness_best, simplicity_mean, simplicity_best, diversity):
+        self.f.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(evals, fitness_mean, fitness_best, simplicity_mean,
+                                                       simplicity_best))
+
+    def write_note(self, note):
+        self.f.write(note + '\n')
+
+    def flush(self):
+        self.f.flush()
+
+
+class BinaryLog:
+    def __init__(self, f, flush_interval):
+        """
+        Records are collected in a buffer and written flush_interval records at a time
+        :param f: file, opened in binary mode
+        :param flush_interval: int
+        """
+        self.f = f
+        self.buffer = numpy.zeros(shape=max(flush_interval, 1), dtype=RECORD)
+        self.size = 0
+        self.run_index = 0
+
+    def write_header(self, header):
+        encoded_header = json.dumps({'header': header, 'record': RECORD.descr}).encode('utf-8')
+        self.f.write(MAGIC + struct.pack('<Q', len(encoded_header)) + encoded_header)
+
+    def start_run(self, run_index):
+        self.run_index = run_index
+
+    def resume_run(self, run_index):
+        self.run_index = run_index
+
+    def write_record(self, evals, fitness_mean, fitness_best, simplicity_mean, simplicity_best, diversity):
+        self.buffer[self.size] = (self.run_index, evals, fitness_mean, fitness_best, simplicity_mean, simplicity_best,
+                                  numpy.nan if diversity is None else diversity)
+        self.size += 1
+        if self.size == len(self.buffer):
+            self.flush()
+
+    def write_frame(self, kind, payload):
+        self.f.write(kind + struct.pack('<Q', len(payload)) + payload)
+
+    def write_note(self, note):
+        # Records written before the note stay before it
+        self.flush()
+        self.write_frame(NOTE_FRAME, json.dumps({'run': self.run_index, 'note': note}).encode('utf-8'))
+        self.f.flush()
+
+    def flush(self):
+        if self.size:
+            self.write_frame(RECORDS_FRAME, self.buffer[:self.size].tobytes())
+        self.size = 0
+        self.f.flush()
+
+
+def is_binary(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_binary(filename):
+    """
+    :param filename: string
+    :return: (string, numpy.array, list) the configuration header, the RECORDs and (run index, note) of every note
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{0} is not a binary log'.format(filename))
+        header = json.loads(f.read(struct.unpack('<Q', f.read(8))[0]).decode('utf-8'))
+        record = numpy.dtype([tuple(x) for x in header['record']])
+        blocks = list()
+        notes = list()
+        while True:
+            frame = f.read(1 + 8)
+            if len(frame) < 1 + 8:
+                break
+            payload = f.read(struct.unpack('<Q', frame[1:])[0])
+            if frame[:1] == RECORDS_FRAME:
+                blocks.append(numpy.frombuffer(payload, dtype=record))
+            elif frame[:1] == NOTE_FRAME:
+                note = json.loads(payload.decode('utf-8'))
+                notes.append((note['run'], note['note']))
+    records = numpy.concatenate(blocks) if blocks else numpy.zeros(shape=0, dtype=record)
+    return header['header'], records.astype(RECORD), notes
+
+
+def load_binary(filename):
+    """
+    :param filename: string
+    :return: (string, numpy.array) the configuration header and the RECORDs
+    """
+    header, records, _ = read_binary(filename)
+    return header, records
+
+
+def load_text(filename, diversity_filename=None):
+    """
+    :param filename: string
+    :param diversity_filename: string, the matching diversity file, if any
+    :return: (string, numpy.array) the configuration header and the RECORDs
+    """
+    with open(filename) as f:
+        runs = re.split(r'\r?\nRun [0-9]+\r?\n', f.read())
+    diversity_runs = None
+    if diversity_filename:
+        with open(diversity_filename) as f:
+            diversity_runs = re.split(r'\r?\nRun [0-9]+\r?\n', f.read())[1:]
+    parts = list()
+    for run_index, run in enumerate(runs[1:]):
+        # Skip lines which are not statistics, such as fitness cache counters
+        data = ' '.join(re.findall(r'^[0-9]+\t.*$', run, flags=re.MULTILINE))
+        columns = numpy.fromstring(data, sep=' ').reshape(-1, 5)
+        part = numpy.zeros(shape=len(columns), dtype=RECORD)
+        part['run'] = run_index
+        for name, column in zip(RECORD.names[1:6], columns.T):
+            part[name] = column
+        part['diversity'] = numpy.nan
+        if diversity_runs:
+            diversities = numpy.fromstring(diversity_runs[run_index], sep=' ')
+            part['diversity'][:len(diversities)] = diversities[:len(part)]
+        parts.append(part)
+    return runs[0], numpy.concatenate(parts) if parts else numpy.zeros(shape=0, dtype=RECORD)
+
+
+def load(filename, diversity_filename=None):
+    """
+    Loads a log of either format
+    :return: (string, numpy.array) the configuration header and the RECORDs
+    """
+    if is_binary(filename):
+        return load_binary(filename)
+    return load_text(filename, diversity_filename)
+
+
+def load_notes(filename):
+    """
+    Loads the notes of a log of either format, such as the fitness cache counters of every run
+    :return: list of (run index, string)
+    """
+    if is_binary(filename):
+        return read_binary(filename)[2]
+    with open(filename) as f:
+        runs = re.split(r'\r?\nRun [0-9]+\r?\n', f.read())
+    return [(run_index, note) for run_index, run in enumerate(runs[1:])
+            for note in re.findall(r'^[^0-9\r\n].*$', run, flags=re.MULTILINE)]
+
+
+def by_run(records, field):
+    """
+    :param records: numpy.array of RECORDs
+    :param field: string, name of a RECORD field
+    :return: numpy.array, axis 0: generations, axis 1: runs, padded with NaN where a run ended early
+    """
+    runs, run_indices, lengths = numpy.unique(records['run'], return_inverse=True, return_counts=True)
+    table = numpy.full((lengths.max() if len(lengths) else 0, len(runs)), numpy.nan)
+    # Records of a run are contiguous and in generation order
+    generations = numpy.arange(len(records)) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    table[generations, run_indices] = records[field]
+    return table
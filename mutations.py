@@ -1,5 +1,6 @@
 """
-These functions add small variation to a list of individuals
+These functions add small variation to a batch of individuals
+Each mutate function modifies a 2d array of individuals (one row each) in place with a handful of numpy calls
 """
 
 import numpy
@@ -9,18 +10,50 @@ def flip_bits(genome_length):
     flip_chance = 1.0 / genome_length
 
     def mutate(individuals):
-        for individual in individuals:
-            for index, chance in enumerate(numpy.random.random(size=genome_length)):
-                if chance < flip_chance:
-                    individual[index] = numpy.random.random_integers(-1, 1)
+        # Every gene is replaced by a random value (-1, 0 or 1) with probability flip_chance
+        flipped = numpy.random.random(size=individuals.shape) < flip_chance
+        individuals[flipped] = numpy.random.randint(-1, 2, size=numpy.count_nonzero(flipped))
+        return individuals
+    return mutate
+
+
+def flip_bits_sparse(genome_length):
+    flip_chance = 1.0 / genome_length
+
+    def mutate(individuals):
+        # Same distribution as flip_bits, but only the positions which flip are sampled
+        # put indexes the flattened array in place, even when individuals is not contiguous
+        positions = sample_flip_positions(individuals.size, flip_chance)
+        numpy.put(individuals, positions, numpy.random.randint(-1, 2, size=len(positions)))
         return individuals
     return mutate
 
 
 def swap_bit(genome_length):
     def mutate(individuals):
-        for individual in individuals:
-            i1, i2 = numpy.random.randint(0, genome_length, size=2)
-            individual[i1], individual[i2] = individual[i2], individual[i1]
+        rows = numpy.arange(len(individuals))
+        first, second = numpy.random.randint(0, genome_length, size=(2, len(individuals)))
+        swapped = individuals[rows, first]
+        individuals[rows, first] = individuals[rows, second]
+        individuals[rows, second] = swapped
         return individuals
     return mutate
+
+
+def sample_flip_positions(number_of_genes, flip_chance):
+    """
+    Chooses which of number_of_genes genes flip, each one independently with probability flip_chance
+    Only the chosen positions are sampled, by drawing the geometric gaps between them
+    :return: numpy.array, sorted flat gene indices
+    """
+    if flip_chance <= 0 or number_of_genes == 0:
+        return numpy.zeros(shape=0, dtype=numpy.int64)
+    if flip_chance >= 1:
+        return numpy.arange(number_of_genes)
+    expected = number_of_genes * flip_chance
+    gaps = numpy.random.geometric(flip_chance, size=int(expected + 4 * expected ** 0.5) + 8)
+    positions = numpy.cumsum(gaps) - 1
+    while positions[-1] < number_of_genes:
+        gaps = numpy.random.geometric(flip_chance, size=len(gaps))
+        positions = numpy.append(positions, positions[-1] + numpy.cumsum(gaps))
+    return positions[:numpy.searchsorted(positions, number_of_genes)]
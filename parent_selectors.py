@@ -1,39 +1,44 @@
 """
-Functions which produce a list of parents
+Functions which select the parents of a generation
+Each select function returns a 2d array of member indices, one (first parent, second parent) row per child
 """
 
 import numpy
 
 
 def uniform_random(number_of_children):
-    def select(fitnesses):
-        for child_index in range(number_of_children):
-            yield numpy.random.randint(0, len(fitnesses), size=2)
+    def select(population):
+        return numpy.random.randint(0, len(population), size=(number_of_children, 2))
     return select
 
 
-def fitness_prop_selection(number_of_children):
-    def select(fitnesses):
-        # Use stochastic acceptance instead of naive CDF (https://en.wikipedia.org/wiki/Fitness_proportionate_selection)
-        m = max(fitnesses)
-        for child_index in range(number_of_children):
-            parents = list()
-            while True:
-                dart = numpy.random.randint(0, len(fitnesses))
-                if numpy.random.random() < (float(fitnesses[dart]) / m):
-                    if dart not in parents:  # Can we have replacement?
-                        parents.append(dart)
-                        if len(parents) >= 2:
-                            break
-            yield parents
+def fitness_prop_selection(number_of_children, distinct=True):
+    """
+    :param distinct: bool, whether both parents of a child must be different members
+    """
+    def select(population):
+        # Search the cumulative sum of the ranks instead of throwing darts one at a time
+        fitnesses = population.ranks
+        if not fitnesses.any():
+            fitnesses = numpy.ones(shape=len(population), dtype=numpy.int64)
+        cumulative_fitnesses = numpy.cumsum(fitnesses)
+
+        def draw(shape):
+            darts = numpy.random.random(size=shape) * cumulative_fitnesses[-1]
+            return numpy.searchsorted(cumulative_fitnesses, darts, side='right')
+        parents = draw((number_of_children, 2))
+        # A single selectable member can not be paired with a different one
+        if distinct and numpy.count_nonzero(fitnesses) > 1:
+            identical = numpy.flatnonzero(parents[:, 0] == parents[:, 1])
+            while len(identical):
+                parents[identical, 1] = draw(len(identical))
+                identical = identical[parents[identical, 0] == parents[identical, 1]]
+        return parents
     return select
 
 
 def k_tournament_with_replacement(number_of_children, k):
-    def select(fitnesses):
-        for child_index in range(number_of_children):
-            parents = list()
-            for _ in range(2):
-                parents.append(min(numpy.random.randint(0, len(fitnesses), size=k)))
-            yield parents
+    def select(population):
+        # The population is sorted best first, so the lowest index of a tournament is its winner
+        return numpy.random.randint(0, len(population), size=(number_of_children, 2, k)).min(axis=2)
     return select
@@ -2,8 +2,10 @@
 Functions for handling pareto fronts
 """
 
+import bisect
 import itertools
-import collections
+
+import numpy
 
 
 def dominates(a, b):
@@ -26,29 +28,67 @@ def generate_zipped_from_fronts(fronts):
     return zipped
 
 
+def front_ranks(fitnesses, simplicities):
+    """
+    Non-dominated sorting of a population maximizing both objectives, in O(n log n)
+    Distinct points are visited by decreasing fitness (then simplicity), every front is represented by the highest
+     simplicity it contains (its tail), which only decreases from one front to the next,
+     so the first front a point is not dominated by is found with a binary search over the tails
+    :param fitnesses: numpy.array
+    :param simplicities: numpy.array
+    :return: numpy.array, index of the front of each individual, 0 being the best front
+    """
+    fitnesses = numpy.asarray(fitnesses)
+    simplicities = numpy.asarray(simplicities)
+    if not len(fitnesses):
+        return numpy.zeros(shape=0, dtype=numpy.int64)
+    points, inverse = numpy.unique(numpy.stack((-fitnesses, -simplicities), axis=1), axis=0, return_inverse=True)
+    negated_tails = list()
+    point_ranks = numpy.empty(shape=len(points), dtype=numpy.int64)
+    bisect_right = bisect.bisect_right
+    for point_index, negated_simplicity in enumerate(points[:, 1].tolist()):
+        rank = bisect_right(negated_tails, negated_simplicity)
+        if rank == len(negated_tails):
+            negated_tails.append(negated_simplicity)
+        else:
+            negated_tails[rank] = negated_simplicity
+        point_ranks[point_index] = rank
+    return point_ranks[inverse.reshape(-1)]
+
+
+def front_order(fitnesses, simplicities):
+    """
+    :return: (numpy.array, numpy.array) front ranks, and the indices which sort the population by front,
+     then by decreasing fitness and simplicity within a front
+    """
+    ranks = front_ranks(fitnesses, simplicities)
+    return ranks, numpy.lexsort((-numpy.asarray(simplicities), -numpy.asarray(fitnesses), ranks))
+
+
 def generate_fronts(zipped):
     """
     Generates a list of pareto fronts from a possibly unsorted list of zipped individuals
     """
-    fronts = list()
     zipped = list(zipped)
-    zipped.sort(key=lambda x: -x[1])
-    while zipped:
-        best_secondary = -999999
-        front = list()
-        new_zipped = collections.deque()
-        for individual in zipped:
-            if individual[2] > best_secondary or (individual[2] == best_secondary and
-                                                  individual[1] == front[-1][1]):
-                best_secondary = individual[2]
-                front.append(individual)
-            else:
-                new_zipped.append(individual)
-        fronts.append(front)
-        zipped = new_zipped
+    ranks, order = front_order([x[1] for x in zipped], [x[2] for x in zipped])
+    fronts = [list() for _ in range(ranks.max() + 1 if len(ranks) else 0)]
+    for index in order:
+        fronts[ranks[index]].append(zipped[index])
     return fronts
 
 
+def rank(population):
+    """
+    Sorts a population by pareto front, tagging each member with its front index (higher being better)
+    :param population: population.Population
+    :return: population.Population
+    """
+    ranks, order = front_order(population.fitnesses, population.simplicities)
+    ranked = population.take(order)
+    ranked.ranks = (ranks.max() + 1 if len(ranks) else 0) - ranks[order]
+    return ranked
+
+
 def verify_fronts(fronts):
     for front_index, front in enumerate(fronts):
         for lesser_front in itertools.islice(fronts, front_index, None):
@@ -58,49 +98,139 @@ def verify_fronts(fronts):
     return True
 
 
-def add_to_pareto_fronts(fronts, individual):
-    for front_index, front in enumerate(fronts):
-        alive_mask = [True] * len(front)
-        for member_index, member in enumerate(front):
-            if individual[1] > member[1] and individual[2] > member[2]:
-                alive_mask[member_index] = False
-                if front_index >= len(fronts) - 1:
-                    fronts.append(list())
-                fronts[front_index + 1].append(member)
-            elif individual[1] < member[1] and individual[2] < member[2]:
+class ParetoArchive:
+    def __init__(self):
+        """
+        A population kept sorted into pareto fronts while individuals are inserted and removed
+        Every front is a numpy.array of three rows: the negated fitnesses (for binary searches), the simplicities and
+         the members of the front, whose columns are sorted by decreasing fitness, so by increasing simplicity
+        Members are opaque integers (such as genome storage rows) identifying the individuals
+        Inserting an individual only rewrites the fronts it and the members it demotes end up in
+        """
+        self.fronts = list()
+        self.size = 0
+
+    def load(self, ranks, fitnesses, simplicities, members):
+        """
+        Replaces the contents of the archive with individuals which are already sorted by front (best first)
+        """
+        columns = numpy.array([-numpy.asarray(fitnesses), simplicities, members], dtype=numpy.int64)
+        boundaries = numpy.flatnonzero(numpy.diff(ranks)) + 1
+        self.fronts = list()
+        for front in numpy.split(numpy.arange(len(ranks)), boundaries) if len(ranks) else []:
+            self.fronts.append(columns[:, front[numpy.lexsort(columns[1::-1, front])]])
+        self.size = len(ranks)
+
+    def dominated_by_front(self, front_index, fitness, simplicity):
+        # Of the members with at least this fitness, the last one has the highest simplicity
+        front = self.fronts[front_index]
+        end = front[0].searchsorted(-fitness, side='right')
+        if not end:
+            return False
+        best_simplicity = front[1, end - 1]
+        return best_simplicity > simplicity or (best_simplicity == simplicity and front[0, end - 1] != -fitness)
+
+    def insert(self, fitness, simplicity, member):
+        """
+        Inserts an individual, demoting the members it dominates (and those they dominate) to later fronts
+        """
+        # Being dominated by a front implies being dominated by every earlier front, so binary search the fronts
+        low, high = 0, len(self.fronts)
+        while low < high:
+            middle = (low + high) // 2
+            if self.dominated_by_front(middle, fitness, simplicity):
+                low = middle + 1
+            else:
+                high = middle
+        self.size += 1
+        pending = numpy.array([[-fitness], [simplicity], [member]], dtype=numpy.int64)
+        front_index = low
+        while pending.shape[1]:
+            if front_index == len(self.fronts):
+                self.fronts.append(pending)
                 break
-        else:
-            front.append(individual)
-            front[:] = itertools.compress(front, alive_mask)
-            break
-
-
-# TODO: Insert into fronted zipped list
-
-
-def get_best_front(zipped):
-    best_front = zipped[0][0]
-    return itertools.takewhile(lambda x: x[0] == best_front, zipped)
+            pending = self.insert_into_front(front_index, pending)
+            front_index += 1
+
+    def insert_into_front(self, front_index, individuals):
+        """
+        Inserts individuals which do not dominate each other and which no member of the front dominates
+        :param individuals: numpy.array, in the layout of a front
+        :return: numpy.array, in the layout of a front, the members the individuals dominate,
+         which have been removed from the front
+        """
+        front = self.fronts[front_index]
+        if individuals.shape[1] == 1:
+            negated_fitness, simplicity = individuals[0, 0], individuals[1, 0]
+            start = front[0].searchsorted(negated_fitness, side='left')
+            if start < front.shape[1] and front[0, start] == negated_fitness and front[1, start] == simplicity:
+                # Duplicates go after their equals, and can not dominate anything their equals did not
+                stop = start = front[0].searchsorted(negated_fitness, side='right')
+            else:
+                # The dominated members have no more fitness and no more simplicity, so they are contiguous
+                stop = max(start, front[1].searchsorted(simplicity, side='right'))
+            self.fronts[front_index] = numpy.concatenate((front[:, :start], individuals, front[:, stop:]), axis=1)
+            return front[:, start:stop]
+        negated_fitnesses, simplicities = individuals[:2]
+        # Of the individuals with at least the fitness of a member, the last one has the highest simplicity
+        ends = negated_fitnesses.searchsorted(front[0], side='right') - 1
+        dominated = (ends >= 0) & ((simplicities[ends] > front[1]) |
+                                   ((simplicities[ends] == front[1]) & (negated_fitnesses[ends] != front[0])))
+        merged = numpy.concatenate((front.compress(~dominated, axis=1), individuals), axis=1)
+        # A stable sort puts duplicates after their equals
+        self.fronts[front_index] = merged.take(merged[0].argsort(kind='mergesort'), axis=1)
+        return front.compress(dominated, axis=1)
+
+    def truncate(self, size):
+        """
+        Removes the individuals with the lowest fitness from the worst fronts until only size are left
+        :return: numpy.array, the removed members
+        """
+        removed = list()
+        while self.size > size:
+            kept = max(self.fronts[-1].shape[1] - (self.size - size), 0)
+            removed.append(self.fronts[-1][2, kept:])
+            self.size -= self.fronts[-1].shape[1] - kept
+            if kept:
+                self.fronts[-1] = self.fronts[-1][:, :kept]
+            else:
+                del self.fronts[-1]
+        return numpy.concatenate(removed) if removed else numpy.zeros(shape=0, dtype=numpy.int64)
+
+    def contents(self, top=None):
+        """
+        :param top: int, tag of the best front, defaults to the number of fronts
+        :return: (numpy.array, numpy.array, numpy.array, numpy.array) ranks (higher being better), fitnesses,
+         simplicities and members of every individual, sorted by front
+        """
+        top = top or len(self.fronts)
+        ranks = numpy.repeat(top - numpy.arange(len(self.fronts)), [front.shape[1] for front in self.fronts])
+        negated_fitnesses, simplicities, members = (numpy.concatenate(self.fronts, axis=1) if self.fronts else
+                                                    numpy.zeros(shape=(3, 0), dtype=numpy.int64))
+        return ranks, -negated_fitnesses, simplicities, members
+
+
+def get_best_front(population):
+    """
+    :param population: population.Population, sorted by front
+    :return: population.Population, the members of the best front
+    """
+    if not len(population):
+        return population
+    return population.take(slice(0, numpy.searchsorted(-population.ranks, -population.ranks[0], side='right')))
 
 
 def compare_fronts(a, b):
-    # Label the two fronts
-    assert len(a[0]) == 4
-    a = [(0, x[1], x[2], x[3]) for x in a]
-    b = [(1, x[1], x[2], x[3]) for x in b]
-
-    # Generate a new set of fronts from the combination of them
-    combined = generate_fronts(a + b)
-
-    # Count tags in top front
-    from_a = sum(1 for x in combined[0] if x[0] == 0)
-    return from_a / float(len(combined[0]))
+    """
+    :param a: population.Population
+    :param b: population.Population
+    :return: float, the fraction of the best front of a and b combined which comes from a
+    """
+    ranks = front_ranks(numpy.append(a.fitnesses, b.fitnesses), numpy.append(a.simplicities, b.simplicities))
+    best = ranks == 0
+    return numpy.count_nonzero(best[:len(a)]) / float(numpy.count_nonzero(best))
 
 
 def fronts_equal(a, b):
-    if len(a) != len(b):
-        return False
-    for a_x, b_x in itertools.izip(a, b):
-        if a_x[1] != b_x[1] or a_x[2] != b_x[2]:
-            return False
-    return True
+    return (len(a) == len(b) and numpy.array_equal(a.fitnesses, b.fitnesses) and
+            numpy.array_equal(a.simplicities, b.simplicities))
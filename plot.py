@@ -3,13 +3,17 @@ Creates a plot given fitness data
 """
 
 # Built-ins
+import os
 import argparse
 import re
-import itertools
 
 # Third party
+import numpy
 import matplotlib.pyplot
 
+# Custom imports
+import metrics_log
+
 parser = argparse.ArgumentParser(description='Generates plots from log files generated by run.py')
 
 parser.add_argument('--log', '-l', dest='log', type=argparse.FileType('r'), required=True,
@@ -22,44 +26,32 @@ parser.add_argument('--title', '-t', dest='title', default=None, type=str, requi
 
 args = parser.parse_args()
 
-# Separate runs
-runs = re.split(r'\r?\nRun [0-9]+\r?\n', args.log.read())
-diversity_runs = re.split(r'\r?\nRun [0-9]+\r?\n', open(args.log.name.replace('.log', '.diversity')).read())
+# Load every run of either log format at once
+args.log.close()
+diversity_filename = args.log.name.replace('.log', '.diversity')
+header, records = metrics_log.load(args.log.name,
+                                   diversity_filename if os.path.exists(diversity_filename) else None)
 
 # Find info from log header
 if not args.title:
-    args.title = re.search(r'CNF[^:\n]+: ([^\r\n]+)', runs[0], flags=re.IGNORECASE).group(1)
-max_evaluations = int(re.search('eval[^:\n]+: ([0-9]+)', runs[0], flags=re.IGNORECASE).group(1))
+    args.title = re.search(r'CNF[^:\n]+: ([^\r\n]+)', header, flags=re.IGNORECASE).group(1)
+max_evaluations = int(re.search('eval[^:\n]+: ([0-9]+)', header, flags=re.IGNORECASE).group(1))
+
+
+def generations(field):
+    """
+    :return: list with one array per generation, holding the values of every run which reached it
+    """
+    return [values[~numpy.isnan(values)] for values in metrics_log.by_run(records, field)]
+
 
 # Prepare data
-evals_values = list()
-average_values = list()
-best_values = list()
-average_values2 = list()
-best_values2 = list()
-diversities = list()
-for run_index, run in enumerate(runs[1:]):
-    diversity_lines = filter(None, list(re.split(r'\r?\n', diversity_runs[run_index + 1])))
-    for line_index, line in enumerate(itertools.ifilter(None, re.split(r'\r?\n', run))):
-        evals, average, best, average2, best2 = re.match(r'([0-9]+)\t([0-9.]+)\t([0-9.]+)\t([0-9.]+)\t([0-9.]+)',
-                                                         line).groups()
-        evals = int(evals)
-        average = float(average)
-        best = float(best)
-        average2 = float(average2)
-        best2 = float(best2)
-        if run_index == 0:
-            evals_values.append(evals)
-            average_values.append(list())
-            best_values.append(list())
-            average_values2.append(list())
-            best_values2.append(list())
-            diversities.append(list())
-        average_values[line_index].append(average)
-        best_values[line_index].append(best)
-        average_values2[line_index].append(average2)
-        best_values2[line_index].append(best2)
-        diversities[line_index].append(float(diversity_lines[line_index].strip()))
+evals_values = numpy.nanmax(metrics_log.by_run(records, 'evals'), axis=1).astype(int).tolist()
+average_values = generations('fitness_mean')
+best_values = generations('fitness_best')
+average_values2 = generations('simplicity_mean')
+best_values2 = generations('simplicity_best')
+diversities = generations('diversity')
 
 
 def plot_fitness_vs_evals(averages, bests, average_color, best_color, average_line_format, best_line_format,
@@ -101,28 +93,31 @@ def plot_fitness_vs_evals(averages, bests, average_color, best_color, average_li
         matplotlib.pyplot.show()
 
 
-def plot_fitness_vs_evals_single(averages, average_color, average_line_format, name):
+def plot_fitness_vs_evals_single(averages, average_color, average_line_format, name, evals=None):
+    # Values may only have been measured at some of the evaluations
+    evals = evals or evals_values
+
     # Plot everything
     figure = matplotlib.pyplot.figure()
     big = figure.add_subplot(1, 1, 1)
 
-    box_step_size = len(average_values) / 10
-    box_width = evals_values[-1] / 17.0
+    box_step_size = max(len(averages) / 10, 1)
+    box_width = evals[-1] / 17.0
 
     def box_and_average_plot(values, color, line_format):
         # Plot box plot
-        box = big.boxplot([x for x in values[::box_step_size]], positions=evals_values[::box_step_size],
-                          labels=[[str(x), ''][i % 2] for i, x in enumerate(evals_values[::box_step_size])],
+        box = big.boxplot([x for x in values[::box_step_size]], positions=evals[::box_step_size],
+                          labels=[[str(x), ''][i % 2] for i, x in enumerate(evals[::box_step_size])],
                           widths=box_width)
         matplotlib.pyplot.setp(box['boxes'], color=color)
 
         # Plot average of values line
-        big.plot(evals_values, [sum(a) / float(len(a)) for a in values], line_format)
+        big.plot(evals, [sum(a) / float(len(a)) for a in values], line_format)
 
     box_and_average_plot(averages, average_color, average_line_format)
 
     # Setup dimensions
-    big.set_xlim(0, evals_values[-1] * 1.05)
+    big.set_xlim(0, evals[-1] * 1.05)
     #big.set_ylim(min(x[0] for x in averages) * 0.95, max(x[-1] for x in averages) * 1.05)
     big.set_ylim(min(min(x for x in column) for column in averages) * 0.95,
                  max(max(x for x in column) for column in averages) * 1.05)
@@ -139,4 +134,8 @@ def plot_fitness_vs_evals_single(averages, average_color, average_line_format, n
 
 plot_fitness_vs_evals(average_values, best_values, 'red', 'blue', 'r--', 'b--', 'MAXSAT')
 plot_fitness_vs_evals(average_values2, best_values2, 'yellow', 'cyan', 'y--', 'c--', 'Robustness')
-plot_fitness_vs_evals_single(diversities, 'magenta', 'm--', 'Diversity')
+# With --diversity-interval only some generations have a diversity
+measured = [index for index, values in enumerate(diversities) if len(values)]
+if measured:
+    plot_fitness_vs_evals_single([diversities[x] for x in measured], 'magenta', 'm--', 'Diversity',
+                                 [evals_values[x] for x in measured])
@@ -0,0 +1,122 @@
+"""
+The population container used by the generation loop
+"""
+
+import numpy
+
+GENOME_DTYPE = numpy.int8
+
+
+class Population:
+    def __init__(self, genomes, rows, ranks, fitnesses, simplicities, counts=None):
+        """
+        A population stored as arrays instead of per-individual objects
+        Genomes live in a storage matrix which may be shared with other populations and may hold unused rows,
+         member i is the genome genomes[rows[i]] with front rank ranks[i] (higher being better),
+         MAXSAT fitness fitnesses[i] and number of 'don't care' variables simplicities[i]
+        Selection only permutes and subsets the member arrays, genomes are never moved
+        NOTE: Rows which are not members of a population may be overwritten when children are added to it,
+         use compact() to keep a population beyond the generation it was created in
+        :param genomes: numpy.array, 2d genome storage of -1, 0 and 1
+        :param rows: numpy.array
+        :param ranks: numpy.array
+        :param fitnesses: numpy.array
+        :param simplicities: numpy.array
+        :param counts: numpy.array, optional per-clause true literal counts, parallel to the genome storage
+        """
+        self.genomes = genomes
+        self.rows = numpy.asarray(rows, dtype=numpy.int64)
+        self.ranks = numpy.asarray(ranks, dtype=numpy.int64)
+        self.fitnesses = numpy.asarray(fitnesses, dtype=numpy.int64)
+        self.simplicities = numpy.asarray(simplicities, dtype=numpy.int64)
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.rows)
+
+    def take(self, indices):
+        """
+        :param indices: numpy.array, member indices (or a slice)
+        :return: Population, with the selected members in the given order, sharing this population's storage
+        """
+        return Population(self.genomes, self.rows[indices], self.ranks[indices], self.fitnesses[indices],
+                          self.simplicities[indices], self.counts)
+
+    def member_genomes(self, indices=slice(None)):
+        """
+        :return: numpy.array, a copy of the genomes of the selected members
+        """
+        return self.genomes[self.rows[indices]]
+
+    def member_counts(self, indices=slice(None)):
+        return self.counts[self.rows[indices]]
+
+    def add(self, children):
+        """
+        Copies the genomes of children into storage rows this population does not use, growing the storage if needed
+        The returned population takes over the storage: rows which are not members of this population are
+         overwritten in place, so other populations sharing the storage (such as ones created by take) may see
+         their genomes change, compact() them first to keep them
+        This population itself is left unchanged, if the storage has to grow it keeps the old, smaller storage
+        :param children: Population
+        :return: Population, the members of this population followed by the children (unranked)
+        """
+        genomes = self.genomes
+        counts = self.counts
+        free_rows = numpy.ones(shape=len(genomes), dtype=bool)
+        free_rows[self.rows] = False
+        free_rows = numpy.flatnonzero(free_rows)
+        if len(free_rows) < len(children):
+            missing = len(children) - len(free_rows)
+            free_rows = numpy.append(free_rows, numpy.arange(len(genomes), len(genomes) + missing))
+            genomes = numpy.concatenate((genomes, numpy.empty(shape=(missing,) + genomes.shape[1:],
+                                                              dtype=genomes.dtype)))
+            if counts is not None:
+                counts = numpy.concatenate((counts, numpy.empty(shape=(missing,) + counts.shape[1:],
+                                                                dtype=counts.dtype)))
+        child_rows = free_rows[:len(children)]
+        genomes[child_rows] = children.member_genomes()
+        if counts is not None:
+            counts[child_rows] = children.member_counts()
+        return Population(genomes, numpy.append(self.rows, child_rows),
+                          numpy.append(self.ranks, children.ranks), numpy.append(self.fitnesses, children.fitnesses),
+                          numpy.append(self.simplicities, children.simplicities), counts)
+
+    def compact(self):
+        """
+        :return: Population, a copy of this population with its own storage holding only its members
+        """
+        return Population(self.member_genomes(), numpy.arange(len(self)), self.ranks, self.fitnesses,
+                          self.simplicities, None if self.counts is None else self.member_counts())
+
+    def zipped(self):
+        """
+        :return: list of (rank, fitness, simplicity, genome) tuples, for output and other non hot-path uses
+        """
+        return zip(self.ranks, self.fitnesses, self.simplicities, self.member_genomes())
+
+
+def create(genomes, fitnesses, simplicities, counts=None):
+    """
+    Creates an unranked population owning the given genomes
+    :param genomes: numpy.array
+    :return: Population
+    """
+    genomes = numpy.ascontiguousarray(genomes, dtype=GENOME_DTYPE)
+    return Population(genomes, numpy.arange(len(genomes)), numpy.zeros(shape=len(genomes), dtype=numpy.int64),
+                      fitnesses, simplicities, counts)
+
+
+def concatenate(parts):
+    """
+    :param parts: list of Population
+    :return: Population, owning a copy of the members of every part, in order
+    """
+    compacted = [part.compact() for part in parts]
+    counts = None
+    if all(part.counts is not None for part in compacted):
+        counts = numpy.concatenate([part.counts for part in compacted])
+    genomes = numpy.concatenate([part.genomes for part in compacted])
+    return Population(genomes, numpy.arange(len(genomes)), numpy.concatenate([part.ranks for part in compacted]),
+                      numpy.concatenate([part.fitnesses for part in compacted]),
+                      numpy.concatenate([part.simplicities for part in compacted]), counts)
@@ -0,0 +1,205 @@
+"""
+Simplification of an equation before it is solved
+Removes duplicate literals and clauses, subsumed clauses, clauses satisfied by unit propagation and pure literals,
+ and every variable which no longer occurs, then renumbers the remaining variables
+Tautologies are kept: a literal only counts as true when its variable is set, so x or not x requires x to be set
+A VariableMap converts genomes of the simplified equation back to the original variable numbering
+Unit propagation and subsumption preserve satisfiability, but not the number of satisfied clauses of every
+ assignment, so genomes should be expanded and re-evaluated on the original equation before they are reported
+"""
+
+import collections
+
+import numpy
+
+import sat_core
+
+
+class VariableMap:
+    def __init__(self, variables, values):
+        """
+        :param variables: numpy.array, the original index of every variable of the simplified equation
+        :param values: numpy.array, one value per original variable
+          0 or 1 for variables fixed by the simplification, -1 for variables which no longer occur ('don't care')
+        """
+        self.variables = variables
+        self.values = values
+
+    def expand(self, genomes):
+        """
+        :param genomes: numpy.array, genomes of the simplified equation
+        :return: numpy.array, the same genomes in the original variable numbering
+        """
+        genomes = numpy.asarray(genomes)
+        expanded = numpy.repeat(self.values[numpy.newaxis, :], len(genomes), axis=0)
+        expanded[:, self.variables] = genomes
+        return expanded
+
+    def restrict(self, genomes):
+        """
+        :param genomes: numpy.array, genomes in the original variable numbering
+        :return: numpy.array, the same genomes for the simplified equation
+        """
+        return numpy.asarray(genomes)[:, self.variables]
+
+
+def normalize_clauses(clause_ids, variables, values):
+    """
+    Sorts the literals of every clause by variable and removes repeated literals
+    :return: (numpy.array, numpy.array, numpy.array) the remaining literals
+    """
+    order = numpy.lexsort((values, variables, clause_ids))
+    clause_ids, variables, values = clause_ids[order], variables[order], values[order]
+    distinct = numpy.ones(shape=len(clause_ids), dtype=bool)
+    distinct[1:] = (clause_ids[1:] != clause_ids[:-1]) | (variables[1:] != variables[:-1]) | (values[1:] != values[:-1])
+    return clause_ids[distinct], variables[distinct], values[distinct]
+
+
+def index_positions(offsets, rows):
+    """
+    :param offsets: numpy.array, the entries of row i of an index are at offsets[i]:offsets[i + 1]
+    :return: numpy.array, the positions of the entries of every given row
+    """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    return numpy.repeat(starts - lengths.cumsum() + lengths, lengths) + numpy.arange(lengths.sum())
+
+
+def propagate(clause_ids, variables, values, number_of_clauses, assignment):
+    """
+    Repeatedly fixes the variables of unit clauses and pure literals, removing the clauses they satisfy and the
+     literals they falsify, until neither is left
+    A variable with conflicting unit clauses is left alone, clauses left without literals are unsatisfiable and dropped
+    Every round fixes all the unit clauses and pure literals that the previous round created, and only visits the
+     literals of the variables it fixes and of the clauses they satisfy, so the whole propagation is linear
+    :param clause_ids: numpy.array, sorted
+    :param assignment: numpy.array, updated in place with the fixed values
+    :return: (numpy.array, numpy.array, numpy.array, int) the remaining literals and the number of removed clauses
+    """
+    number_of_variables = len(assignment)
+    clause_offsets = numpy.searchsorted(clause_ids, numpy.arange(number_of_clauses + 1))
+    occurrences = numpy.argsort(variables, kind='mergesort')
+    occurrence_offsets = numpy.searchsorted(variables[occurrences], numpy.arange(number_of_variables + 1))
+    alive = numpy.ones(shape=len(clause_ids), dtype=bool)
+    satisfied = numpy.zeros(shape=number_of_clauses, dtype=bool)
+    lengths = numpy.bincount(clause_ids, minlength=number_of_clauses)
+    positive = numpy.bincount(variables[values == 1], minlength=number_of_variables)
+    negative = numpy.bincount(variables[values == 0], minlength=number_of_variables)
+    # A unit clause only goes away when its variable is fixed, so the units of unfixed variables are never cleared
+    positive_units = numpy.zeros(shape=number_of_variables, dtype=bool)
+    negative_units = numpy.zeros(shape=number_of_variables, dtype=bool)
+
+    changed_clauses = numpy.flatnonzero(lengths)
+    changed_variables = numpy.arange(number_of_variables)
+    while len(changed_clauses) or len(changed_variables):
+        units = changed_clauses[(lengths[changed_clauses] == 1) & ~satisfied[changed_clauses]]
+        unit_literals = index_positions(clause_offsets, units)
+        unit_literals = unit_literals[alive[unit_literals]]
+        positive_units[variables[unit_literals[values[unit_literals] == 1]]] = True
+        negative_units[variables[unit_literals[values[unit_literals] == 0]]] = True
+
+        candidates = numpy.unique(numpy.concatenate((changed_variables, variables[unit_literals])))
+        candidates = candidates[assignment[candidates] == -1]
+        fixed = numpy.full(len(candidates), -1, dtype=numpy.int8)
+        fixed[(positive[candidates] > 0) & (negative[candidates] == 0)] = 1
+        fixed[(negative[candidates] > 0) & (positive[candidates] == 0)] = 0
+        fixed[positive_units[candidates] & ~negative_units[candidates]] = 1
+        fixed[negative_units[candidates] & ~positive_units[candidates]] = 0
+        candidates, fixed = candidates[fixed != -1], fixed[fixed != -1]
+        if not len(candidates):
+            break
+        assignment[candidates] = fixed
+
+        literals = occurrences[index_positions(occurrence_offsets, candidates)]
+        literals = literals[alive[literals]]
+        true = values[literals] == assignment[variables[literals]]
+        newly_satisfied = numpy.unique(clause_ids[literals[true]])
+        satisfied[newly_satisfied] = True
+        falsified = literals[~true]
+        alive[falsified] = False
+        numpy.subtract.at(lengths, clause_ids[falsified], 1)
+        # Every other literal of a satisfied clause goes away with it
+        removed_literals = index_positions(clause_offsets, newly_satisfied)
+        removed_literals = removed_literals[alive[removed_literals]]
+        alive[removed_literals] = False
+        numpy.subtract.at(positive, variables[removed_literals[values[removed_literals] == 1]], 1)
+        numpy.subtract.at(negative, variables[removed_literals[values[removed_literals] == 0]], 1)
+
+        # Repeats are harmless, the candidates are made unique
+        changed_clauses = clause_ids[falsified]
+        changed_variables = variables[removed_literals]
+    removed = len(numpy.unique(clause_ids)) - len(numpy.unique(clause_ids[alive]))
+    return clause_ids[alive], variables[alive], values[alive], removed
+
+
+def remove_redundant_clauses(clauses):
+    """
+    Removes duplicate clauses and clauses which contain every literal of another clause
+    :param clauses: list of tuples of (signed, sorted) literals
+    :return: (list, int, int) the remaining clauses in their original order, the numbers of duplicates and subsumed
+    """
+    first_indices = dict()
+    for index, clause in enumerate(clauses):
+        first_indices.setdefault(clause, index)
+    duplicates = len(clauses) - len(first_indices)
+
+    # Visit shorter clauses first, a clause can only subsume longer ones
+    candidates = sorted(first_indices.itervalues(), key=lambda index: (len(clauses[index]), index))
+    occurrences = collections.defaultdict(set)
+    for index in candidates:
+        for literal in clauses[index]:
+            occurrences[literal].add(index)
+    subsumed = set()
+    longest = len(clauses[candidates[-1]]) if candidates else 0
+    for index in candidates:
+        # Duplicates are gone, so only strictly longer clauses can be subsumed
+        if len(clauses[index]) == longest:
+            break
+        if index in subsumed:
+            continue
+        literal_sets = [occurrences[literal] for literal in clauses[index]]
+        supersets = min(literal_sets, key=len).intersection(*literal_sets)
+        supersets.discard(index)
+        for superset in supersets:
+            subsumed.add(superset)
+            for literal in clauses[superset]:
+                occurrences[literal].discard(superset)
+    return [clauses[index] for index in sorted(set(candidates) - subsumed)], duplicates, len(subsumed)
+
+
+def simplify(equation):
+    """
+    :param equation: sat_core.Equation
+    :return: (sat_core.Equation, VariableMap, dict) the simplified equation, its variable map and the number of
+     clauses and variables removed by every step
+    """
+    number_of_variables = equation.number_of_variables
+    statistics = collections.OrderedDict()
+    statistics['empty clauses'] = int(numpy.count_nonzero(numpy.diff(equation.clause_offsets) == 0))
+
+    clause_ids, variables, values = normalize_clauses(
+        equation.literal_clauses, equation.literal_variables, equation.literal_values.astype(numpy.int8))
+
+    assignment = numpy.full(number_of_variables, -1, dtype=numpy.int8)
+    clause_ids, variables, values, statistics['propagated clauses'] = propagate(
+        clause_ids, variables, values, equation.number_of_clauses, assignment)
+
+    # Group the signed literals of each clause, which are sorted by variable
+    signed = ((variables.astype(numpy.int64) + 1) * (2 * values.astype(numpy.int64) - 1)).tolist()
+    starts = numpy.flatnonzero(numpy.diff(clause_ids)) + 1
+    bounds = zip([0] + starts.tolist(), starts.tolist() + [len(signed)]) if len(signed) else []
+    clauses, statistics['duplicate clauses'], statistics['subsumed clauses'] = remove_redundant_clauses(
+        [tuple(signed[start:stop]) for start, stop in bounds])
+
+    # Renumber the variables which still occur, the others are fixed or left as 'don't care'
+    lengths = [len(clause) for clause in clauses]
+    literals = numpy.array([literal for clause in clauses for literal in clause], dtype=numpy.int64)
+    kept = numpy.unique(numpy.abs(literals) - 1)
+    # Propagation removes every literal of the variables it fixes, so no variable is both fixed and kept
+    statistics['fixed variables'] = int(numpy.count_nonzero(assignment != -1))
+    statistics['dropped variables'] = number_of_variables - len(kept) - statistics['fixed variables']
+    clause_offsets = numpy.zeros(shape=len(clauses) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=clause_offsets[1:])
+    simplified = sat_core.Equation(len(kept), clause_offsets, numpy.searchsorted(kept, numpy.abs(literals) - 1),
+                                   literals > 0)
+    return simplified, VariableMap(kept, assignment), statistics
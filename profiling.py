@@ -0,0 +1,111 @@
+"""
+Low overhead timing of the phases of the generation loop
+Functions are wrapped once, when the EA is set up, so nothing is timed (or slowed down) unless profiling is enabled
+The time of a phase excludes the phases nested in it, so the times of all phases and 'other' add up to
+ the time of the run
+"""
+
+import json
+import resource
+import collections
+import timeit
+
+timer = timeit.default_timer
+
+# Phases in the order they are reported, phases which are never wrapped are left out
+PHASES = ['parent selection', 'recombination', 'mutation', 'local search', 'evaluation', 'free variable counting',
+          'front sorting', 'survival selection', 'migration', 'logging', 'diversity', 'termination', 'checkpointing']
+
+
+class Profiler:
+    def __init__(self):
+        self.seconds = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+        # One [time spent in nested phases] entry per phase currently running
+        self.stack = list()
+        self.started = timer()
+        self.evals = 0
+
+    def wrap(self, name, function):
+        """
+        :return: function, which behaves like function but adds its time and call to the named phase
+        """
+        stack = self.stack
+        seconds = self.seconds
+        calls = self.calls
+
+        def timed(*args, **kwargs):
+            nested = [0.0]
+            stack.append(nested)
+            start = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = timer() - start
+                stack.pop()
+                seconds[name] += elapsed - nested[0]
+                calls[name] += 1
+                if stack:
+                    stack[-1][0] += elapsed
+        return timed
+
+    def merge(self, other):
+        """
+        Adds the phases and evaluations of another profiler, such as one of an island
+        """
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+            self.calls[name] += other.calls[name]
+        self.evals += other.evals
+
+    def summary(self):
+        """
+        :return: dict, machine-readable totals, including the peak resident set size of this process and its children
+        """
+        elapsed = timer() - self.started
+        names = [x for x in PHASES if x in self.calls] + sorted(x for x in self.calls if x not in PHASES)
+        peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+        return collections.OrderedDict([
+            ('evals', self.evals),
+            ('seconds', elapsed),
+            ('evals_per_second', self.evals / elapsed if elapsed else 0.0),
+            ('peak_rss_bytes', peak_rss),
+            # Time outside of every phase, such as building populations
+            ('other_seconds', max(elapsed - sum(self.seconds.values()), 0.0)),
+            ('phases', collections.OrderedDict((name, collections.OrderedDict([
+                ('calls', self.calls[name]), ('seconds', self.seconds[name])])) for name in names)),
+        ])
+
+    def report(self, title):
+        """
+        :return: string, a human readable table of the summary
+        """
+        summary = self.summary()
+        lines = ['{0}: {1} evaluations in {2:.3f} seconds ({3:.1f} evaluations/second), peak RSS {4:.1f} MB'.format(
+            title, summary['evals'], summary['seconds'], summary['evals_per_second'],
+            summary['peak_rss_bytes'] / 2.0 ** 20)]
+        lines.append('  {0:<24}{1:>10}{2:>12}{3:>8}'.format('phase', 'calls', 'seconds', 'share'))
+        for name, phase in summary['phases'].items():
+            lines.append('  {0:<24}{1:>10}{2:>12.4f}{3:>7.1f}%'.format(
+                name, phase['calls'], phase['seconds'],
+                100.0 * phase['seconds'] / summary['seconds'] if summary['seconds'] else 0.0))
+        lines.append('  {0:<24}{1:>10}{2:>12.4f}{3:>7.1f}%'.format(
+            'other', '', summary['other_seconds'],
+            100.0 * summary['other_seconds'] / summary['seconds'] if summary['seconds'] else 0.0))
+        return '\n'.join(lines)
+
+    def write(self, f, run_index):
+        """
+        Writes the summary of a run as one line of JSON
+        """
+        f.write(json.dumps(collections.OrderedDict([('run', run_index + 1)] + self.summary().items())) + '\n')
+
+
+def wrap(profiler, name, function):
+    """
+    :return: function, timed by profiler if there is one
+    """
+    if profiler is None or function is None:
+        return function
+    return profiler.wrap(name, function)
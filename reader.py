@@ -3,10 +3,18 @@ A class for reading DIMACS-style equations
 """
 
 import re
+import gzip
+import bz2
+
 import numpy
 
 import sat_core
 
+# Number of bytes tokenized at a time by read_DIMACS_stream
+CHUNK_SIZE = 2 ** 22
+# The characters numpy.fromstring and str.split separate tokens with
+WHITESPACE = numpy.frombuffer(b' \t\n\r\v\f', dtype=numpy.uint8)
+
 
 def verify_DIMACS(s):
     """
@@ -66,27 +74,145 @@ def read_DIMACS(s):
     :return: sat_core.Equation
     """
 
-    sign_transform = {
-        -1: 0,
-        1: 1,
-        0: -1,
-    }
-
-    clauses = None
-    clause_index = 0
+    number_of_variables = 0
+    literal_variables = list()
+    literal_values = list()
+    clause_offsets = [0]
     for line in s.split('\n'):
-        symbols = re.split(r' +', line)
-        if symbols[0] in ['', 'c']:
+        symbols = line.split()
+        if not symbols or symbols[0] == 'c':
             continue
         if symbols[0] == 'p' and symbols[1] == 'cnf':
-            number_of_literals = int(symbols[2])
-            number_of_clauses = int(symbols[3])
-            clauses = numpy.full(shape=(number_of_clauses, number_of_literals), fill_value=-2, dtype=numpy.int8)
+            number_of_variables = int(symbols[2])
         else:
             for symbol in symbols:
-                if symbol == '0':
+                literal = int(symbol)
+                if literal == 0:
                     continue
-                clauses[clause_index, abs(int(symbol)) - 1] = sign_transform[numpy.sign(int(symbol))]
-            clause_index += 1
+                literal_variables.append(abs(literal) - 1)
+                literal_values.append(literal > 0)
+            clause_offsets.append(len(literal_variables))
+
+    return sat_core.Equation(number_of_variables, clause_offsets, literal_variables, literal_values)
+
+
+def open_DIMACS(filename):
+    """
+    Opens a DIMACS file for reading, transparently decompressing .gz, .bz2 and .xz files
+    .xz files need the lzma module, which python 2 only has through the backports.lzma package
+    :param filename: string
+    :return: file
+    :raises ValueError: when the file is compressed with xz and no lzma module is installed
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    if filename.endswith('.bz2'):
+        return bz2.BZ2File(filename, 'rb')
+    if filename.endswith('.xz'):
+        try:
+            import lzma
+        except ImportError:
+            try:
+                from backports import lzma
+            except ImportError:
+                raise ValueError('Reading .xz files requires the backports.lzma package on python 2 '
+                                 '(pip install backports.lzma).')
+        return lzma.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def count_literals(text):
+    """
+    :param text: string, part of the clause section
+    :return: int, the number of whitespace separated literals in text
+    :raises ValueError: when a token of text is not an integer
+    """
+    codes = numpy.frombuffer(text, dtype=numpy.uint8)
+    whitespace = numpy.in1d(codes, WHITESPACE)
+    token_starts = ~whitespace & numpy.append(True, whitespace[:-1])
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+    signs = ((codes == ord('-')) | (codes == ord('+'))) & token_starts & numpy.append(digits[1:], False)
+    if not numpy.all(whitespace | digits | signs):
+        invalid = next(token for token in text.split() if not re.match(r'[-+]?[0-9]+$', token))
+        raise ValueError('Invalid literal in clause: {0}'.format(invalid))
+    return int(numpy.count_nonzero(token_starts))
+
+
+def read_DIMACS_stream(f, chunk_size=CHUNK_SIZE):
+    """
+    Verify and create an equation in a single pass over a file (or any object with a read method, such as an mmap)
+    The clause section is tokenized a chunk at a time, so the whole file is never held in memory
+    See http://www.satcompetition.org/2009/format-benchmarks2009.html
+    :param f: file
+    :param chunk_size: int, number of bytes read at a time
+    :return: sat_core.Equation
+    :raises ValueError: with the same messages as verify_DIMACS when the file is not valid
+    """
+    # Read the comment block and the p-line line by line
+    number_of_variables = None
+    number_of_clauses = None
+    remainder = ''
+    while number_of_variables is None:
+        chunk = f.read(chunk_size)
+        if not chunk and not remainder:
+            raise ValueError('No p-line found.')
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop() if chunk else ''
+        for line_index, line in enumerate(lines):
+            line = line.strip()
+            if not line or line[0] == 'c':
+                continue
+            if line[0] != 'p':
+                raise ValueError('clause before p-line.')
+            match = re.match(r'p cnf ([0-9]+) ([0-9]+)', line)
+            if not match:
+                raise ValueError('invalid p-line.')
+            number_of_variables = int(match.group(1))
+            number_of_clauses = int(match.group(2))
+            remainder = '\n'.join(lines[line_index + 1:] + [remainder])
+            break
+
+    # Tokenize the clause section, carrying partial lines and partial clauses over to the next chunk
+    literal_blocks = list()
+    length_blocks = list()
+    carried_literals = numpy.zeros(shape=0, dtype=numpy.int64)
+    not_a_literal = re.compile(r'^[ \t\r]*[^-0-9\s]', flags=re.MULTILINE)
+    while True:
+        chunk = f.read(chunk_size)
+        text = remainder + chunk
+        if chunk:
+            split = text.rfind('\n') + 1
+            text, remainder = text[:split], text[split:]
+        match = not_a_literal.search(text)
+        if match:
+            symbol = text[match.end() - 1]
+            if symbol == 'c':
+                raise ValueError('Comments found outside of initial comment block.')
+            if symbol == 'p':
+                raise ValueError('Multiple p lines found.')
+            raise ValueError('Invalid symbol in clause: {0}'.format(symbol))
+        parsed = numpy.fromstring(text, dtype=numpy.int64, sep=' ')
+        # fromstring silently stops at the first token which is not an integer
+        if len(parsed) != count_literals(text):
+            raise ValueError('Invalid literal in clause.')
+        tokens = numpy.concatenate((carried_literals, parsed))
+        ends = numpy.flatnonzero(tokens == 0)
+        complete = ends[-1] + 1 if len(ends) else 0
+        carried_literals = tokens[complete:]
+        literals = tokens[:complete][tokens[:complete] != 0]
+        if len(literals) and numpy.max(numpy.abs(literals)) > number_of_variables:
+            raise ValueError('Variable number greater than number of variables')
+        literal_blocks.append(literals)
+        length_blocks.append(numpy.diff(numpy.append(-1, ends)) - 1)
+        if not chunk:
+            break
+    if len(carried_literals):
+        raise ValueError('Clause does not end with a zero.')
 
-    return sat_core.Equation(clauses)
+    clause_lengths = numpy.concatenate(length_blocks)
+    if len(clause_lengths) != number_of_clauses:
+        raise ValueError('Not enough clauses')
+    literals = numpy.concatenate(literal_blocks)
+    clause_offsets = numpy.zeros(shape=len(clause_lengths) + 1, dtype=numpy.int64)
+    numpy.cumsum(clause_lengths, out=clause_offsets[1:])
+    return sat_core.Equation(number_of_variables, clause_offsets, numpy.abs(literals) - 1, literals > 0)
@@ -1,12 +1,47 @@
 """
 Functions which create children out of parents
+Each recombine function fills a preallocated offspring buffer with one child per row of parent_rows
+ genomes: 2d array of genomes the parents are taken from
+ parent_rows: 2d array, one (first parent, second parent) pair of rows of genomes per child
+ offspring: 2d array with at least one row per child, which is overwritten
 """
 
 import numpy
 
 
+def combine(genomes, parent_rows, offspring, from_first):
+    """
+    Writes the genes of the first parents where from_first is set and the genes of the second parents elsewhere
+    """
+    children = offspring[:len(parent_rows)]
+    numpy.take(genomes, parent_rows[:, 1], axis=0, out=children)
+    numpy.copyto(children, genomes[parent_rows[:, 0]], where=from_first)
+    return children
+
+
 def crossover(genome_size):
-    def recombine(parents):
-        crossover_point = numpy.random.randint(0, genome_size)
-        return numpy.append(parents[0][:crossover_point], parents[1][crossover_point:])
+    def recombine(genomes, parent_rows, offspring):
+        # One-point crossover, genes before the crossover point come from the first parent
+        crossover_points = numpy.random.randint(0, genome_size, size=len(parent_rows))
+        from_first = numpy.arange(genome_size) < crossover_points[:, numpy.newaxis]
+        return combine(genomes, parent_rows, offspring, from_first)
+    return recombine
+
+
+def two_point_crossover(genome_size):
+    def recombine(genomes, parent_rows, offspring):
+        # Genes between the two crossover points come from the second parent
+        crossover_points = numpy.sort(numpy.random.randint(0, genome_size + 1, size=(len(parent_rows), 2)), axis=1)
+        gene_indices = numpy.arange(genome_size)
+        from_first = ((gene_indices < crossover_points[:, 0, numpy.newaxis]) |
+                      (gene_indices >= crossover_points[:, 1, numpy.newaxis]))
+        return combine(genomes, parent_rows, offspring, from_first)
+    return recombine
+
+
+def uniform_crossover(genome_size):
+    def recombine(genomes, parent_rows, offspring):
+        # Every gene comes from either parent with equal probability
+        from_first = numpy.random.random(size=(len(parent_rows), genome_size)) < 0.5
+        return combine(genomes, parent_rows, offspring, from_first)
     return recombine
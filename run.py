@@ -7,9 +7,12 @@ Prints solutions to a solution file
 """
 
 # Built-ins
+import os
 import time
 import sys
 import itertools
+import multiprocessing
+import StringIO
 
 # Third-party libraries
 import numpy
@@ -25,31 +28,82 @@ import initializers
 import survival_strategies
 import pareto
 import sat_core
+import populations
+import equation_cache
+import evaluation_pool
+import fitness_cache
+import local_search
+import preprocessing
+import metrics_log
+import checkpoints
+import profiling
+import diversity_metrics
 
 import configuration
 
 args = configuration.args
 
-# Start timer so that we know how long the task took
-genesis = time.clock()
+# Start timer so that we know how long the task took (wall time, since runs may happen in other processes)
+genesis = time.time()
+
+# Continue an interrupted job from its checkpoint, with the random number seed it was started with
+checkpoint = None
+if args.resuming:
+    try:
+        checkpoint = checkpoints.load(args.checkpoint)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    args.seed = checkpoint['seed']
 
 # Print all selected configuration options
 print('\n'.join("{0}: {1}".format(k, v) for k, v in args.__dict__.iteritems()))
 
-# Read the CNF file, but first try to give helpful error messages if it is not valid
-equation_string = args.equation.read()
-error = reader.verify_DIMACS(equation_string)
-if error:
+# Read the CNF file (possibly compressed) in one pass, giving helpful error messages if it is not valid
+args.equation.close()
+try:
+    if args.cache:
+        equation, cache_hit = equation_cache.read_DIMACS_cached(args.equation.name, args.cache_directory)
+        print('Equation cache {0}'.format('hit' if cache_hit else 'miss'))
+    else:
+        with reader.open_DIMACS(args.equation.name) as equation_file:
+            equation = reader.read_DIMACS_stream(equation_file)
+except ValueError as error:
     print(error)
     sys.exit(1)
 
-equation = reader.read_DIMACS(equation_string)
+# Simplify the equation, solutions are mapped back to the original variables whenever they are written
+original_equation = equation
+variable_map = None
+preprocessing_summary = None
+if args.preprocess:
+    equation, variable_map, simplification = preprocessing.simplify(original_equation)
+    preprocessing_summary = ', '.join('{0} {1}'.format(v, k) for k, v in simplification.iteritems())
+    print('Preprocessing removed: {0}'.format(preprocessing_summary))
+    if not equation.number_of_variables:
+        # Nothing is left to evolve, so evolve the original equation starting from the assignment that was found
+        print('Preprocessing left no variables, solving the original equation instead')
+        equation = original_equation
+        solved_variable_map = variable_map
+        variable_map = None
 
 pareto_filename = args.pareto.name if args.pareto else 'None'
 diversity_filename = args.diversity.name if args.diversity else 'None'
+count_cache_hits = not args.free_cache_hits
+
+
+def create_log(f):
+    """
+    :return: metrics_log.TextLog or metrics_log.BinaryLog writing to f, according to --log-format
+    """
+    if args.log_format == 'binary':
+        return metrics_log.BinaryLog(f, args.log_flush_interval)
+    return metrics_log.TextLog(f)
+
 
 # Write log header
-args.log.write("""CNF file: {args.equation.name}
+main_log = create_log(args.log)
+log_header = """CNF file: {args.equation.name}
 Random number seed: {args.seed}
 Number of runs: {args.runs}
 Maximum number of fitness evaluations per run: {args.evals}
@@ -66,27 +120,160 @@ Parent tournament size: {args.parent_k}
 Survival tournament size: {args.survival_k}
 Seed File: {args.seed_file}
 Evolution strategy: {args.survival_strategy}
+Crossover: {args.crossover}
+Mutation: {args.mutation}
+Local search: {args.local_search}
+Local search steps: {args.local_search_steps}
+Local search noise: {args.local_search_noise}
+Local search rate: {args.local_search_rate}
+Worker processes: {args.jobs}
+Islands: {args.islands}
+Migration interval: {args.migration_interval}
+Migration topology: {args.topology}
+Incremental evaluation: {args.incremental}
+Preprocessing: {preprocessing_summary}
+Evaluation worker processes: {args.evaluation_workers}
+Fitness cache (MB): {args.fitness_cache}
+Cache hits count as evaluations: {count_cache_hits}
+Log format: {args.log_format}
+Diversity measure: {args.diversity_measure}
+Diversity interval: {args.diversity_interval}
 
 Result Log
-""".format(**locals()))
-
-# Write solution header
-args.solution.write("c Solution for: {args.equation.name}\n".format(**locals()))
-
-
-def run():
-    overall_best_front = list()
-
-    # Load seeds if specified
-    seeds = list()
-    if args.seed_file:
-        seeds = initializers.read_from_file(args.seed_file, equation.number_of_variables)
-
-    # Setup termination functions
-    terminator_functions = list()
+""".format(**locals())
+
+
+def output_files():
+    """
+    :return: dict of every output file by name
+    """
+    return {name: f for name, f in [('log', args.log), ('solution', args.solution), ('pareto', args.pareto),
+                                    ('diversity', args.diversity), ('profile', args.profile_output)] if f}
+
+
+def flush_outputs():
+    """
+    :return: dict, the length of every output file by name once everything written so far is flushed
+    """
+    main_log.flush()
+    lengths = dict()
+    for name, f in output_files().iteritems():
+        f.flush()
+        lengths[name] = os.fstat(f.fileno()).st_size
+    return lengths
+
+
+if checkpoint:
+    if checkpoint['header'] != log_header:
+        print('{0} was written with different options'.format(args.checkpoint))
+        sys.exit(1)
+    # Drop whatever was written after the checkpoint, it will be written again
+    for name, f in output_files().iteritems():
+        f.truncate(checkpoint['outputs'][name])
+else:
+    main_log.write_header(log_header)
+
+    # Write solution header
+    args.solution.write("c Solution for: {args.equation.name}\n".format(**locals()))
+
+checkpointer = None
+if args.checkpoint:
+    checkpointer = checkpoints.Checkpointer(args.checkpoint, args.checkpoint_generations, args.checkpoint_seconds,
+                                            flush_outputs)
+
+
+# Load seeds if specified
+seeds = list()
+if args.seed_file:
+    seeds = initializers.read_from_file(args.seed_file, original_equation.number_of_variables)
+if variable_map:
+    seeds = list(variable_map.restrict(seeds)) if seeds else list()
+elif args.preprocess and equation is original_equation:
+    seeds.append(solved_variable_map.expand(numpy.zeros(shape=(1, 0), dtype=numpy.int8))[0])
+
+
+def write_front(f, front):
+    genomes, fitnesses, simplicities = front.member_genomes(), front.fitnesses, front.simplicities
+    if variable_map:
+        # Report solutions of the original equation
+        genomes = variable_map.expand(genomes)
+        fitnesses = original_equation.evaluate(genomes)
+        simplicities = original_equation.count_free_variables(genomes)
+    for fitness, simplicity, genome in zip(fitnesses, simplicities, genomes):
+        f.write("c MAXSAT fitness value: {0}\n".format(fitness))
+        f.write("c Number of 'don't care' variables: {0}\n".format(simplicity))
+        f.write('v {0}\n'.format(' '.join(str((i + 1) * [-1, 1][x]) for i, x in enumerate(genome) if x != -1)))
+
+
+def population_diversity(population):
+    """
+    :return: float, the --diversity-measure of a population
+    """
+    if args.diversity_measure == 'hamming':
+        return diversity_metrics.mean_hamming_distance(population.member_genomes())
+    if args.diversity_measure == 'entropy':
+        return diversity_metrics.mean_gene_entropy(population.member_genomes())
+    front = pareto.get_best_front(population)
+    return diversity_metrics.front_spread(numpy.column_stack((front.fitnesses, front.simplicities)), [0, 0],
+                                          [equation.number_of_clauses, equation.number_of_variables])
+
+
+def measure_population(population, generation, measure_diversity=population_diversity):
+    """
+    The diversity is only measured every --diversity-interval generations, it is None for the others
+    :param generation: int, 0 for the initial population
+    :param measure_diversity: function, population_diversity or a replacement with the same arguments
+    :return: (sum of fitnesses, best fitness, sum of simplicities, best simplicity, population size, diversity)
+    """
+    measure = None
+    if args.diversity and generation % args.diversity_interval == 0:
+        measure = measure_diversity(population)
+    return (numpy.sum(population.fitnesses), numpy.max(population.fitnesses), numpy.sum(population.simplicities),
+            numpy.max(population.simplicities), len(population), measure)
+
+
+def write_statistics(log, diversity, evals, statistics):
+    # Record average and best
+    fitness_sum, best_fitness, simplicity_sum, best_simplicity, size, measure = statistics
+    log.write_record(evals, float(fitness_sum) / size, best_fitness, float(simplicity_sum) / size, best_simplicity,
+                     measure)
+    if diversity:
+        diversity.write(str(measure if measure is not None else float('nan')) + '\n')
+
+
+def create_fitness_cache():
+    """
+    :return: fitness_cache.FitnessCache for a single population, or None if --fitness-cache is disabled
+    """
+    if not args.fitness_cache:
+        return None
+    return fitness_cache.FitnessCache(equation.number_of_variables, args.fitness_cache)
+
+
+def write_cache_statistics(log, hits, misses):
+    log.write_note("Fitness cache: {0} hits, {1} misses".format(hits, misses))
+
+
+def evolve_population(population_seed, record, migrate=None, cache=None, checkpointer=None, resume=None,
+                      profiler=None):
+    """
+    Evolves a single population until one of the termination conditions is met
+    record(evals, population, generation) is called for the initial population (generation 0) and after every
+     generation
+    migrate(generation_index, population), if given, is called after every generation's survival selection and
+     returns a (possibly empty) populations.Population of immigrants to add to the population
+    cache, if given, is a fitness_cache.FitnessCache consulted before evaluating any organism
+    checkpointer, if given, is a checkpoints.Checkpointer which saves the state of the population whenever it is due
+    resume, if given, is the state of the population saved in a checkpoint, to continue from instead of starting over
+    profiler, if given, is a profiling.Profiler which times every phase of the generation loop
+    :return: populations.Population, the final population
+    """
+    numpy.random.seed(population_seed)
+
+    # Setup termination conditions
+    active_terminators = list()
     if args.terminate_pareto != -1:
-        terminator = terminators.StablePareto(args.terminate_pareto)
-        terminator_functions.append(terminator.evaluate)
+        active_terminators.append(terminators.StablePareto(args.terminate_pareto))
 
     # Choose parent selection algorithm
     select_parents = {
@@ -96,10 +283,27 @@ def run():
     }[args.parent_selection]
 
     # Choose recombination function
-    recombine = recombination.crossover(equation.number_of_variables)
+    recombine = {
+        'one-point': recombination.crossover(equation.number_of_variables),
+        'two-point': recombination.two_point_crossover(equation.number_of_variables),
+        'uniform': recombination.uniform_crossover(equation.number_of_variables)
+    }[args.crossover]
 
     # Choose mutation function
-    mutate = mutations.flip_bits(equation.number_of_variables)
+    mutate = {
+        'flip': mutations.flip_bits(equation.number_of_variables),
+        'sparse': mutations.flip_bits_sparse(equation.number_of_variables),
+        'swap': mutations.swap_bit(equation.number_of_variables)
+    }[args.mutation]
+
+    # Choose local search, if any
+    improve = {
+        'none': None,
+        'walksat': local_search.walksat(equation, args.local_search_steps, args.local_search_noise,
+                                        args.local_search_rate),
+        'gsat': local_search.walksat(equation, args.local_search_steps, args.local_search_noise,
+                                     args.local_search_rate, greedy=True)
+    }[args.local_search]
 
     # Choose survival selection function
     select_survivors = {
@@ -109,103 +313,348 @@ def run():
         'kTourn': survival_selectors.k_tournament_without_replacement(args.population_size, args.survival_k)
     }[args.survival_selection]
 
-    # Choose survival strategy
+    # Choose survival strategy, plus with truncation can maintain its fronts incrementally
     survival_strategy = {
         'plus': survival_strategies.plus,
         'comma': survival_strategies.comma
     }[args.survival_strategy]
-
-    # Actually run the algorithm
-    for run_index in range(args.runs):
-        args.log.write('\nRun {0}\n'.format(run_index + 1))
-
+    if args.survival_strategy == 'plus' and args.survival_selection == 'Truncation':
+        survival_strategy = survival_strategies.IncrementalPlus(args.population_size).select
+
+    # Choose fitness evaluation
+    delta_evaluator = sat_core.DeltaEvaluator(equation) if args.incremental else None
+    pool = None
+    if args.evaluation_workers:
+        pool = evaluation_pool.EvaluationPool(equation, args.evaluation_workers,
+                                              max(args.population_size, args.children), args.evaluation_threshold)
+        evaluate = pool.evaluate
+    else:
+        count_free_variables = profiling.wrap(profiler, 'free variable counting', equation.count_free_variables)
+
+        def evaluate(organisms):
+            return equation.evaluate(organisms), count_free_variables(organisms)
+
+    def score(organisms):
+        """
+        :return: (numpy.array, numpy.array, int) fitnesses, numbers of free variables and evaluations to count
+        """
+        if cache:
+            fitnesses, simplicities, misses = cache.evaluate(organisms, evaluate)
+            return fitnesses, simplicities, misses if args.free_cache_hits else len(organisms)
+        return evaluate(organisms) + (len(organisms),)
+
+    def terminated(population, evals):
+        if any(terminator.evaluate(population) for terminator in active_terminators):
+            return True
+        return args.evals != -1 and evals >= args.evals
+
+    # Time every phase when profiling, otherwise the functions are left as they are
+    select_parents = profiling.wrap(profiler, 'parent selection', select_parents)
+    recombine = profiling.wrap(profiler, 'recombination', recombine)
+    mutate = profiling.wrap(profiler, 'mutation', mutate)
+    improve = profiling.wrap(profiler, 'local search', improve)
+    score = profiling.wrap(profiler, 'evaluation', score)
+    if delta_evaluator:
+        evaluate_individuals = profiling.wrap(profiler, 'evaluation', delta_evaluator.evaluate)
+        evaluate_children = profiling.wrap(profiler, 'evaluation', delta_evaluator.evaluate_children)
+    rank = profiling.wrap(profiler, 'front sorting', pareto.rank)
+    survival_strategy = profiling.wrap(profiler, 'front sorting', survival_strategy)
+    add_immigrants = profiling.wrap(profiler, 'front sorting', survival_strategies.plus)
+    select_survivors = profiling.wrap(profiler, 'survival selection', select_survivors)
+    migrate = profiling.wrap(profiler, 'migration', migrate)
+    record = profiling.wrap(profiler, 'logging', record)
+    terminated = profiling.wrap(profiler, 'termination', terminated)
+    save_checkpoint = profiling.wrap(profiler, 'checkpointing', checkpointer.save if checkpointer else None)
+
+    if resume:
+        numpy.random.set_state(resume['random_state'])
+        population, evals, active_terminators = resume['population'], resume['evals'], resume['terminators']
+        first_generation = resume['generation_index'] + 1
+    else:
         # Generate initial population randomly and/or with seeds
         individuals = initializers.initialize(args.population_size, equation.number_of_variables)
         if seeds:
             individuals = numpy.concatenate((individuals[:-len(seeds)], seeds))
-
-        # Calculate fitness values
-        pareto_indices = [0] * args.population_size
-        fitnesses = equation.evaluate(individuals)
-        simplicities = equation.count_free_variables(individuals)
-        # Sort population by fitness
-        zipped = zip(pareto_indices, fitnesses, simplicities, individuals)
-        fronts = pareto.generate_fronts(zipped)
-        zipped = pareto.generate_zipped_from_fronts(fronts)
-        pareto_indices, fitnesses, simplicities, individuals = zip(*zipped)
-
-        # Increment the number of evaluations that have occurred
-        evals = args.population_size
-
-        # Record average and best
-        args.log.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(evals,
-                       float(sum(fitnesses)) / len(fitnesses), max(fitnesses),
-                       float(sum(simplicities)) / len(simplicities), max(simplicities)))
-        if args.diversity:
-            args.diversity.write('\nRun {0}\n'.format(run_index + 1))
-            args.diversity.write(str(sat_core.measure(pareto.get_best_front(zipped), [1, 2], [0, 0, 0],
-                                                      [0, equation.number_of_clauses,
-                                                       equation.number_of_variables])) + '\n')
-
-        for generation_index in itertools.count():
-            sys.stdout.write('.')
-            # Generate children
-            children = [recombine((individuals[parent_indices[0]], individuals[parent_indices[1]]))
-                        for parent_indices in select_parents(pareto_indices)]
-            mutate(children)
-            children_fitnesses = equation.evaluate(children)
-            children_simplicity = equation.count_free_variables(children)
+        individuals = individuals.astype(populations.GENOME_DTYPE)
+
+        # Calculate fitness values and sort population by fitness, counting the evaluations that have occurred
+        if delta_evaluator:
+            population = populations.create(individuals, *evaluate_individuals(individuals))
+            evals = args.population_size
+        else:
+            fitnesses, simplicities, evals = score(individuals)
+            population = populations.create(individuals, fitnesses, simplicities)
+        population = rank(population)
+        record(evals, population, 0)
+        first_generation = 0
+
+    # Children are built in the same buffer every generation
+    offspring = numpy.empty(shape=(args.children, equation.number_of_variables), dtype=populations.GENOME_DTYPE)
+
+    for generation_index in itertools.count(first_generation):
+        sys.stdout.write('.')
+        # Generate children
+        parent_indices = select_parents(population)
+        parent_rows = population.rows[parent_indices]
+        genomes = population.genomes
+        children = recombine(genomes, parent_rows, offspring)
+        mutate(children)
+        if improve:
+            evals += improve(children)
+        if delta_evaluator:
+            children = populations.create(children, *evaluate_children(
+                children, genomes[parent_rows], population.counts[parent_rows],
+                population.fitnesses[parent_indices], population.simplicities[parent_indices]))
             evals += len(children)
-            children_pareto = [0] * len(children)
-            zipped_children = zip(children_pareto, children_fitnesses, children_simplicity, children)
-
-            # Choose survivors
-            zipped = survival_strategy(zipped, zipped_children, select_survivors)
-            pareto_indices, fitnesses, simplicities, individuals = zip(*zipped)
-
-            # Record average and best
-            args.log.write("{0}\t{1}\t{2}\t{3}\t{4}\n".format(evals,
-                           float(sum(fitnesses)) / len(fitnesses), max(fitnesses),
-                           float(sum(simplicities)) / len(simplicities), max(simplicities)))
-            if args.diversity:
-                args.diversity.write(str(sat_core.measure(pareto.get_best_front(zipped), [1, 2], [0, 0, 0],
-                                                          [0, equation.number_of_clauses,
-                                                           equation.number_of_variables])) + '\n')
-
-            # Check for termination
-            if any(terminator(zipped) for terminator in terminator_functions):
-                break
-            if args.evals != -1 and evals >= args.evals:
-                break
-
-        print('Best of run: {0} {1}'.format(max(x[1] for x in zipped), max(x[2] for x in zipped)))
-
-        best_front = list(pareto.get_best_front(zipped))
-
-        # Write pareto front
-        if args.pareto:
-            args.pareto.write('c Run {run_index}\n'.format(**locals()))
-            for solution in best_front:
-                args.pareto.write("c MAXSAT fitness value: {0}\n".format(solution[1]))
-                args.pareto.write("c Number of 'don't care' variables: {0}\n".format(solution[2]))
-                args.pareto.write('v {0}\n'.format(' '.join(str((i + 1) * [-1, 1][x])
-                                                            for i, x in enumerate(solution[3]) if x != -1)))
+        else:
+            fitnesses, simplicities, child_evals = score(children)
+            children = populations.create(children, fitnesses, simplicities)
+            evals += child_evals
+
+        # Choose survivors
+        population = survival_strategy(population, children, select_survivors)
+
+        # Exchange individuals with other populations, immigrants compete with the population as in a plus strategy
+        immigrants = migrate(generation_index, population) if migrate else None
+        if immigrants:
+            population = add_immigrants(population, immigrants, select_survivors)
+
+        record(evals, population, generation_index + 1)
+
+        # Check for termination
+        if terminated(population, evals):
+            break
+
+        if checkpointer and checkpointer.due(generation_index):
+            save_checkpoint({'population': population.compact(), 'evals': evals, 'generation_index': generation_index,
+                               'terminators': active_terminators, 'cache': cache,
+                               'random_state': numpy.random.get_state()})
+
+    if pool:
+        pool.close()
+    if profiler:
+        profiler.evals = evals
+    return population
+
+
+def island_neighbors(island_index):
+    """
+    :return: list of the islands that island_index sends its emigrants to
+    """
+    if args.topology == 'ring':
+        return [(island_index + 1) % args.islands]
+    return [x for x in range(args.islands) if x != island_index]
+
+
+def evolve_island(run_index, island_index, channels, results):
+    """
+    Evolves one island in its own process
+    Every args.migration_interval generations the island sends its best front to its neighbors, then waits for the
+     emigrants of every island which sends to it, so migration is deterministic regardless of process timing
+    An island which has terminated sends None instead, and keeps draining its channels until its sources terminate
+    Puts (island_index, [(evals, statistics)], best front, (cache hits, cache misses), profiling.Profiler or None)
+     on results
+    """
+    sources = [x for x in range(args.islands) if island_index in island_neighbors(x)]
+    statistics = list()
+    profiler = profiling.Profiler() if args.profile else None
+    measure_diversity = profiling.wrap(profiler, 'diversity', population_diversity)
+
+    def record(evals, population, generation):
+        statistics.append((evals, measure_population(population, generation, measure_diversity)))
+
+    def migrate(generation_index, population):
+        if (generation_index + 1) % args.migration_interval:
+            return None
+        emigrants = pareto.get_best_front(population).compact()
+        for neighbor in island_neighbors(island_index):
+            channels[(island_index, neighbor)].put(emigrants)
+        immigrants = list()
+        for source in list(sources):
+            message = channels[(source, island_index)].get()
+            if message is None:
+                sources.remove(source)
+            else:
+                immigrants.append(message)
+        return populations.concatenate(immigrants) if immigrants else None
+
+    cache = create_fitness_cache()
+    population = evolve_population([args.seed, run_index, island_index], record, migrate, cache, profiler=profiler)
+    results.put((island_index, statistics, pareto.get_best_front(population).compact(),
+                 (cache.hits, cache.misses) if cache else None, profiler))
+
+    for neighbor in island_neighbors(island_index):
+        channels[(island_index, neighbor)].put(None)
+    for source in sources:
+        while channels[(source, island_index)].get() is not None:
+            pass
+
+
+def evolve_islands(run_index, log, diversity, profiler=None):
+    """
+    Evolves args.islands populations in parallel processes with migration between them
+    Log lines combine every island: evaluations are summed, averages are taken over all islands' individuals,
+     the diversity measure is averaged over the islands which measured it, and an island which has terminated keeps
+     its last values
+    The phase times of every island are added to profiler, if given, so they can exceed the time of the run
+    :return: populations.Population, the best pareto front of the union of all islands
+    """
+    channels = {(source, neighbor): multiprocessing.Queue()
+                for source in range(args.islands) for neighbor in island_neighbors(source)}
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=evolve_island, args=(run_index, island_index, channels, results))
+                 for island_index in range(args.islands)]
+    for process in processes:
+        process.start()
+    island_results = sorted(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    island_statistics = [statistics for island_index, statistics, best_front, cache_counts, _ in island_results]
+    for generation_index in range(max(len(statistics) for statistics in island_statistics)):
+        current = [statistics[min(generation_index, len(statistics) - 1)] for statistics in island_statistics]
+        evals = sum(x[0] for x in current)
+        combined = zip(*(x[1] for x in current))
+        measures = [x for x in combined[5] if x is not None]
+        measure = float(sum(measures)) / len(measures) if measures else None
+        write_statistics(log, diversity, evals,
+                         (sum(combined[0]), max(combined[1]), sum(combined[2]), max(combined[3]), sum(combined[4]),
+                          measure))
+
+    if args.fitness_cache:
+        write_cache_statistics(log, *(sum(counts) for counts in
+                                      zip(*(cache_counts for _, _, _, cache_counts, _ in island_results))))
+
+    if profiler:
+        for island_profiler in (x[4] for x in island_results):
+            profiler.merge(island_profiler)
+
+    combined = populations.concatenate([best_front for _, _, best_front, _, _ in island_results])
+    return pareto.get_best_front(pareto.rank(combined)).compact()
+
+
+def evolve(run_index, log, diversity, pareto_output, profile_output=None, resume=None):
+    """
+    Performs a single run of the algorithm, writing its sections of the log, diversity, pareto and profile files
+    Every run is seeded from --seed and its index, so its results do not depend on which process runs it
+    resume, if given, is the state of the run saved in a checkpoint, whose sections are already partly written
+    :return: populations.Population, the best pareto front of the run
+    """
+    if resume:
+        log.resume_run(run_index)
+    else:
+        log.start_run(run_index)
+        if diversity:
+            diversity.write('\nRun {0}\n'.format(run_index + 1))
+
+    profiler = profiling.Profiler() if args.profile else None
+    if args.islands > 1:
+        best_front = evolve_islands(run_index, log, diversity, profiler)
+    else:
+        measure_diversity = profiling.wrap(profiler, 'diversity', population_diversity)
+
+        def record(evals, population, generation):
+            write_statistics(log, diversity, evals, measure_population(population, generation, measure_diversity))
+        cache = resume['cache'] if resume else create_fitness_cache()
+        population = evolve_population([args.seed, run_index], record, cache=cache, checkpointer=checkpointer,
+                                       resume=resume, profiler=profiler)
+        best_front = pareto.get_best_front(population).compact()
+        if cache:
+            write_cache_statistics(log, cache.hits, cache.misses)
+
+    # Write pareto front
+    if pareto_output:
+        pareto_output.write('c Run {run_index}\n'.format(**locals()))
+        write_front(pareto_output, best_front)
+
+    if profiler:
+        print('\n' + profiler.report('Profile of run {0}'.format(run_index + 1)))
+        if profile_output:
+            profiler.write(profile_output, run_index)
+
+    log.flush()
+    return best_front
+
+
+def evolve_in_worker(run_index):
+    """
+    Performs a run in a worker process, returning its output sections as strings for the main process to merge
+    """
+    log = StringIO.StringIO()
+    diversity = StringIO.StringIO() if args.diversity else None
+    pareto_output = StringIO.StringIO() if args.pareto else None
+    profile_output = StringIO.StringIO() if args.profile_output else None
+    best_front = evolve(run_index, create_log(log), diversity, pareto_output, profile_output)
+    return (best_front, log.getvalue(), diversity.getvalue() if diversity else '',
+            pareto_output.getvalue() if pareto_output else '', profile_output.getvalue() if profile_output else '')
+
+
+def run():
+    overall_best_front = None
+    first_run = 0
+    resume = None
+    if checkpoint:
+        overall_best_front = checkpoint['overall_best_front']
+        first_run = checkpoint['run_index']
+        resume = checkpoint['generation']
+
+    # Actually run the algorithm, either serially or spread over worker processes
+    if args.jobs == 1:
+        def serial_runs():
+            for run_index in range(first_run, args.runs):
+                if checkpointer:
+                    checkpointer.state = {'header': log_header, 'seed': args.seed, 'run_index': run_index,
+                                          'overall_best_front': overall_best_front}
+                yield evolve(run_index, main_log, args.diversity, args.pareto, args.profile_output,
+                             resume if run_index == first_run else None)
+        best_fronts = serial_runs()
+        pool = None
+    else:
+        pool = multiprocessing.Pool(args.jobs or None)
+        results = pool.imap(evolve_in_worker, range(args.runs))
+
+        def merge():
+            # Write the output sections of every run in run order
+            for best_front, log, diversity, pareto_output, profile_output in results:
+                args.log.write(log)
+                if args.diversity:
+                    args.diversity.write(diversity)
+                if args.pareto:
+                    args.pareto.write(pareto_output)
+                if args.profile_output:
+                    args.profile_output.write(profile_output)
+                yield best_front
+        best_fronts = merge()
+
+    for run_index, best_front in enumerate(best_fronts, first_run):
+        print('Best of run: {0} {1}'.format(numpy.max(best_front.fitnesses), numpy.max(best_front.simplicities)))
 
         # Update best of all runs
-        percent_better = pareto.compare_fronts(best_front, overall_best_front)
+        percent_better = pareto.compare_fronts(best_front, overall_best_front) if overall_best_front else 1.0
         if percent_better > 0.5:
             print('New best front! ({})'.format(percent_better))
             overall_best_front = best_front
 
+        # Save progress between runs as well
+        if checkpointer:
+            checkpointer.state.update(run_index=run_index + 1, overall_best_front=overall_best_front)
+            checkpointer.save()
+
+    if pool:
+        pool.close()
+        pool.join()
+
     # Write overall best pareto front
-    args.solution.write("c Number of solutions in pareto front: {0}\n".format(len(overall_best_front)))
-    for solution in overall_best_front:
-        args.solution.write("c MAXSAT fitness value: {0}\n".format(solution[1]))
-        args.solution.write("c Number of 'don't care' variables: {0}\n".format(solution[2]))
-        args.solution.write('v {0}\n'.format(' '.join(str((i + 1) * [-1, 1][x])
-                                                      for i, x in enumerate(solution[3]) if x != -1)))
+    args.solution.write("c Number of solutions in pareto front: {0}\n".format(len(overall_best_front or [])))
+    if overall_best_front:
+        write_front(args.solution, overall_best_front)
+
+    # The job is complete, there is nothing left to resume
+    if checkpointer and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
 
+# --profile times the phases of the generation loop, for a per-function breakdown use:
 #import cProfile; cProfile.run('run()')
 run()
 
-print("Done in {0} seconds.".format(time.clock() - genesis))
+print("Done in {0} seconds.".format(time.time() - genesis))
@@ -5,49 +5,209 @@ This module contains all classes and functions relevant to any sat solver
 # Third party
 import numpy
 
+# Custom imports
+import diversity_metrics
+
 
 class Equation:
-    def __init__(self, clauses):
+    # Upper bound on the temporary memory used by one vectorized evaluation pass
+    evaluation_chunk_bytes = 2 ** 26
+
+    def __init__(self, number_of_variables, clause_offsets, literal_variables, literal_values):
         """
-        clauses should be a 2d numpy array,
-         axis 0: length = number of clauses, elements = clauses
-         axis 1: length = number of variables, elements = literals
-          -2 for a literal not used in the clause
+        Clauses are stored sparsely in CSR style, so memory grows with the number of literals
+         literal_variables: 1d array, the (0-based) variable index of every literal of every clause, clause by clause
+         literal_values: 1d array, the value a variable must have to satisfy each literal
            1 for a normal literal
            0 for a negated literal
-        :param clauses: numpy.array
+         clause_offsets: 1d array of length number of clauses + 1,
+          the literals of clause i are literal_variables[clause_offsets[i]:clause_offsets[i + 1]]
+        :param number_of_variables: int
+        :param clause_offsets: numpy.array
+        :param literal_variables: numpy.array
+        :param literal_values: numpy.array
         """
-        self.clauses = clauses
-        self.number_of_clauses = self.clauses.shape[0]
-        self.number_of_variables = self.clauses.shape[1]
+        self.number_of_variables = number_of_variables
+        self.clause_offsets = numpy.asarray(clause_offsets, dtype=numpy.int64)
+        self.literal_variables = numpy.asarray(literal_variables, dtype=numpy.int32)
+        self.literal_values = numpy.asarray(literal_values, dtype=numpy.int8)
+        self.number_of_clauses = len(self.clause_offsets) - 1
+        self.number_of_literals = len(self.literal_variables)
+        # Empty clauses can never be satisfied, so only the starts of non-empty clauses are needed for reduceat
+        clause_lengths = numpy.diff(self.clause_offsets)
+        self.clause_starts = self.clause_offsets[:-1][clause_lengths > 0]
+        # Variable -> literal occurrence index, built the first time it is needed
+        #  the literals of variable v are occurrence_literals[occurrence_offsets[v]:occurrence_offsets[v + 1]]
+        self.literal_clauses = numpy.repeat(numpy.arange(self.number_of_clauses, dtype=numpy.int32), clause_lengths)
+        self.occurrence_offsets = None
+        self.occurrence_literals = None
 
-    def evaluate(self, organisms):
+    def evaluate(self, organisms, chunk_size=None):
         """
         Counts how many clauses are true for multiple solutions
+        The whole population is scored in vectorized chunks,
+         each chunk only allocates about evaluation_chunk_bytes of temporaries
 
         Organisms is a 2d array
          axis 0: length = number of organisms, elements = SAT solutions
-         axis 1: length = number of clauses, elements = values for each variable (0 or 1)
+         axis 1: length = number of variables, elements = values for each variable (-1, 0 or 1)
 
         :param organisms: numpy.array
-        :return: list[int]
+        :param chunk_size: int, number of organisms scored per pass, defaults to a size based on evaluation_chunk_bytes
+        :return: numpy.array
         """
-        clauses = self.clauses
-        numpy_sum = numpy.sum
-        numpy_any = numpy.any
-        return [numpy_sum(numpy_any(clauses == organism, axis=1)) for organism in organisms]
+        organisms = numpy.asarray(organisms)
+        if chunk_size is None:
+            bytes_per_organism = max(self.number_of_literals, 1) * (organisms.itemsize + 1)
+            chunk_size = max(self.evaluation_chunk_bytes // bytes_per_organism, 1)
+        fitnesses = numpy.empty(shape=len(organisms), dtype=numpy.int64)
+        literal_variables = self.literal_variables
+        literal_values = self.literal_values
+        for start in range(0, len(organisms), chunk_size):
+            chunk = organisms[start:start + chunk_size]
+            fitnesses[start:start + chunk_size] = self.count_satisfied_clauses(
+                chunk[:, literal_variables] == literal_values)
+        return fitnesses
+
+    def count_satisfied_clauses(self, satisfied_literals):
+        """
+        Reduces a boolean array of satisfied literals (along its last axis) into the number of satisfied clauses
+        :param satisfied_literals: numpy.array
+        :return: int or numpy.array
+        """
+        if not len(self.clause_starts):
+            return numpy.zeros(shape=satisfied_literals.shape[:-1], dtype=numpy.int64)[()]
+        satisfied_clauses = numpy.logical_or.reduceat(satisfied_literals, self.clause_starts, axis=-1)
+        return numpy.sum(satisfied_clauses, axis=-1)
 
     def count_free_variables(self, organisms):
-        all_free = numpy.full(shape=self.number_of_variables, fill_value=-1, dtype=numpy.int32)
-        numpy_sum = numpy.sum
-        return list(numpy_sum(organisms == all_free, axis=1))
+        """
+        Counts how many variables are left unset (-1) for multiple solutions
+        :param organisms: numpy.array
+        :return: numpy.array
+        """
+        return numpy.sum(numpy.asarray(organisms) == -1, axis=1)
+
+    def build_occurrences(self):
+        """
+        Builds the variable -> literal occurrence index
+        """
+        self.occurrence_literals = numpy.argsort(self.literal_variables, kind='mergesort').astype(numpy.int64)
+        self.occurrence_offsets = numpy.zeros(shape=self.number_of_variables + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.literal_variables, minlength=self.number_of_variables),
+                     out=self.occurrence_offsets[1:])
+
+    def occurrences(self, variables):
+        """
+        Returns the indices of every literal of the given variables
+        :param variables: numpy.array
+        :return: numpy.array
+        """
+        if self.occurrence_offsets is None:
+            self.build_occurrences()
+        starts = self.occurrence_offsets[variables]
+        lengths = self.occurrence_offsets[numpy.asarray(variables) + 1] - starts
+        # Concatenate the ranges [start, start + length) without a Python loop
+        ends = numpy.cumsum(lengths)
+        positions = numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - (ends - lengths), lengths)
+        return self.occurrence_literals[positions]
+
+    def true_literal_counts(self, organisms):
+        """
+        Counts the true literals of every clause for multiple solutions
+        :param organisms: numpy.array
+        :return: numpy.array, axis 0: organisms, axis 1: clauses
+        """
+        organisms = numpy.asarray(organisms)
+        counts = numpy.zeros(shape=(len(organisms), self.number_of_clauses), dtype=numpy.int32)
+        if len(self.clause_starts):
+            satisfied_literals = organisms[:, self.literal_variables] == self.literal_values
+            counts[:, numpy.diff(self.clause_offsets) > 0] = numpy.add.reduceat(
+                satisfied_literals.astype(numpy.int32), self.clause_starts, axis=1)
+        return counts
+
+    def update_true_literal_counts(self, counts, variables, old_values, new_values):
+        """
+        Updates the true literal counts of one solution in place after some of its variables change
+        Only the clauses containing the changed variables are touched
+        :param counts: numpy.array, true literal counts of the old solution (from true_literal_counts)
+        :param variables: numpy.array, indices of the changed variables
+        :param old_values: numpy.array, previous values of those variables
+        :param new_values: numpy.array, new values of those variables
+        :return: int, change in the number of satisfied clauses
+        """
+        literals = self.occurrences(variables)
+        if not len(literals):
+            return 0
+        variables = numpy.asarray(variables)
+        repeats = self.occurrence_offsets[variables + 1] - self.occurrence_offsets[variables]
+        literal_values = self.literal_values[literals]
+        deltas = ((numpy.repeat(new_values, repeats) == literal_values).astype(numpy.int32) -
+                  (numpy.repeat(old_values, repeats) == literal_values))
+        clauses = self.literal_clauses[literals]
+        touched = numpy.unique(clauses)
+        satisfied_before = numpy.count_nonzero(counts[touched])
+        numpy.add.at(counts, clauses, deltas)
+        return numpy.count_nonzero(counts[touched]) - satisfied_before
+
+
+class DeltaEvaluator:
+    def __init__(self, equation):
+        """
+        Scores children incrementally from the per-clause true literal counts of their parents
+        :param equation: Equation
+        """
+        self.equation = equation
+
+    def evaluate(self, organisms):
+        """
+        Scores organisms from scratch
+        :param organisms: numpy.array
+        :return: (numpy.array, numpy.array, numpy.array) fitnesses, numbers of free variables and clause counts
+        """
+        counts = self.equation.true_literal_counts(organisms)
+        return numpy.count_nonzero(counts, axis=1), self.equation.count_free_variables(organisms), counts
+
+    def evaluate_children(self, children, parent_genomes, parent_counts, parent_fitnesses, parent_simplicities):
+        """
+        Scores each child by re-scoring only the clauses touched by the variables that differ from its closest parent
+        Every parent argument has one row per child and one column per parent (axes 0 and 1)
+        :param children: numpy.array
+        :param parent_genomes: numpy.array
+        :param parent_counts: numpy.array, true literal counts of the parents
+        :param parent_fitnesses: numpy.array
+        :param parent_simplicities: numpy.array
+        :return: (numpy.array, numpy.array, numpy.array) fitnesses, numbers of free variables and clause counts
+        """
+        # Diff every child against both of its parents at once and start from the closest
+        differences = parent_genomes != children[:, numpy.newaxis, :]
+        closest = numpy.argmin(numpy.count_nonzero(differences, axis=2), axis=1)
+        child_indices = numpy.arange(len(children))
+        counts = parent_counts[child_indices, closest]
+        fitnesses = parent_fitnesses[child_indices, closest].astype(numpy.int64)
+        simplicities = parent_simplicities[child_indices, closest].astype(numpy.int64)
+        for child_index, child in enumerate(children):
+            parent = parent_genomes[child_index, closest[child_index]]
+            variables = numpy.flatnonzero(differences[child_index, closest[child_index]])
+            old_values = parent[variables]
+            new_values = child[variables]
+            fitnesses[child_index] += self.equation.update_true_literal_counts(counts[child_index], variables,
+                                                                               old_values, new_values)
+            simplicities[child_index] += (numpy.count_nonzero(new_values == -1) -
+                                          numpy.count_nonzero(old_values == -1))
+        return fitnesses, simplicities, counts
 
 
 def hamming_distance(s1, s2):
-    """Return the Hamming distance between equal-length sequences"""
-    if len(s1) != len(s2):
+    """
+    Return the Hamming distance between equal-length sequences
+    Either may be a 2d array of genomes, which gives the distance of every row
+    """
+    s1 = numpy.asarray(s1)
+    s2 = numpy.asarray(s2)
+    if s1.shape[-1:] != s2.shape[-1:]:
         raise ValueError("Undefined for sequences of unequal length")
-    return sum(ch1 != ch2 for ch1, ch2 in zip(s1, s2))
+    return numpy.count_nonzero(s1 != s2, axis=-1)
 
 
 def measure(front, objectives, mins, maxs):
@@ -55,25 +215,12 @@ def measure(front, objectives, mins, maxs):
     Calculates the normalized hyper-volume between each point on a Pareto front and its neighbors
     Returns the percentage of the total normalized volume NOT taken up by these volumes
         A higher return value corresponds to a better distributed Pareto front
-    front: non-empty list of class objects with an objectives dictionary member variable
-    objectives: list of objective names (needs to match what's in the individual's objectives dictionary)
-    mins: dictionary with objective names as keys and the minimum possible value for that objective as values
-    maxs: dictionary with objective names as keys and the maximum possible value for that objective as values
+    See diversity_metrics.front_spread, which takes the objective values as an array
+    front: non-empty list of individual tuples
+    objectives: list of objective indices into the individual tuples
+    mins: list with the minimum possible value of every objective, indexed like the individual tuples
+    maxs: list with the maximum possible value of every objective, indexed like the individual tuples
     """
-    front = [(index, x[1], x[2], x[3]) for index, x in enumerate(front)]
-    # This will store the hyper-volume between neighboring individuals on the front; initialize all volumes to 1
-    volumes = {individual[0]: 1.0 for individual in front}
-    # There is one more volume of interest than there is points on the front, so associate it with the max value
-    volumes['max'] = 1.0
-    for objective in objectives:
-        # Sort the front by this objective's values
-        sorted_front = sorted(front, key=lambda x: x[objective])
-        # Calculate the volume between the first solution and minimum
-        volumes[sorted_front[0][0]] *= float(sorted_front[0][objective]-mins[objective])/(maxs[objective]-mins[objective])
-        # Calculate the volume between adjacent solutions on the front
-        for i in range(1, len(sorted_front)):
-            volumes[sorted_front[i][0]] *= float(sorted_front[i][objective]-sorted_front[i-1][objective])/(maxs[objective]-mins[objective])
-        # Calculate the volume between the maximum and the last solution
-        volumes['max'] *= float(maxs[objective]-sorted_front[-1][objective])/(maxs[objective]-mins[objective])
-    # The normalized volume of the entire objective space is 1.0, subtract the volumes we calculated to turn this into maximization
-    return 1.0 - sum(volumes.values())
+    points = numpy.array([[individual[objective] for objective in objectives] for individual in front])
+    return diversity_metrics.front_spread(points, [mins[objective] for objective in objectives],
+                                         [maxs[objective] for objective in objectives])
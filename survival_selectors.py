@@ -8,49 +8,68 @@ NOTE: These functions MUST maintain sorting
 import numpy
 
 
-def ordered_random_sample(collection, k):
-    # Uses reservoir sampling: https://en.wikipedia.org/wiki/Reservoir_sampling to perform in O(len(collection))
-    number_selected = 0
-    for index, element in enumerate(collection):
-        # Optimization: Use reverse counter
-        probability = float(k - number_selected) / (len(collection) - index)
-        if numpy.random.random() < probability:
-            yield element
-            number_selected += 1
+def ordered_random_sample(size, k):
+    """
+    :return: numpy.array, k distinct indices below size chosen uniformly at random, in increasing order
+    """
+    if k >= size:
+        return numpy.arange(size)
+    return numpy.sort(numpy.random.permutation(size)[:k])
 
 
 def uniform_random(population_size):
-    def select(zipped):
-        return list(ordered_random_sample(zipped, population_size))
+    def select(population):
+        return population.take(ordered_random_sample(len(population), population_size))
     return select
 
 
 def fitness_prop_selection(population_size):
-    def select(zipped):
-        # Use stochastic acceptance instead of naive CDF (https://en.wikipedia.org/wiki/Fitness_proportionate_selection)
-        m = float(max(zipped, key=lambda x: x[0])[0])
-        # Optimization: Use inverse Stochastic acceptance?
-        for partition_index in range(population_size):
-            # Optimization: Perform multiple comparisons at once?
-            while True:
-                dart = numpy.random.randint(partition_index, len(zipped))
-                if numpy.random.random() < (zipped[dart][0] / m):
-                    zipped[partition_index], zipped[dart] = zipped[dart], zipped[partition_index]
-                    break
-        return sorted(zipped[:population_size], key=lambda x: -x[0])
+    def select(population):
+        # Weighted sampling without replacement (Efraimidis and Spirakis), every member draws a key u ** (1 / rank)
+        #  and the largest keys survive, which is distributed like drawing survivors one at a time
+        if population_size >= len(population):
+            return population
+        keys = numpy.log1p(-numpy.random.random(size=len(population))) / population.ranks
+        survivors = numpy.argpartition(-keys, population_size - 1)[:population_size]
+        return population.take(numpy.sort(survivors))
     return select
 
 
 def truncate(population_size):
-    def select(zipped):
-        return zipped[:population_size]
+    def select(population):
+        return population.take(slice(0, population_size))
     return select
 
 
 def k_tournament_without_replacement(population_size, k):
-    def select(zipped):
-        for partition_index in range(len(zipped) - population_size):
-            dead_index = max(numpy.random.randint(partition_index, len(zipped), size=k))
-            zipped[partition_index], zipped[dead_index] = zipped[dead_index], zipped[partition_index]
-        return sorted(zipped[len(zipped) - population_size:], key=lambda x: -x[0])
+    def select(population):
+        # Tournaments are played one after another among the members still alive, each eliminating its worst (last)
+        #  member, so every tournament eliminates a different member
+        # They are drawn in batches from candidates, which may still hold members eliminated by earlier batches,
+        #  a tournament with an eliminated member is drawn again, which is the same as drawing it among the living
+        dead = numpy.zeros(shape=len(population), dtype=bool)
+        candidates = numpy.arange(len(population))
+        dead_candidates = 0
+        remaining = len(population) - population_size
+        while remaining > 0:
+            # About as many tournaments as can be played before one meets the loser of an earlier one
+            size = min(remaining, int(numpy.sqrt(2.0 * len(candidates) / k)) + 1)
+            tournaments = candidates[numpy.random.randint(0, len(candidates), size=(size, k))]
+            tournaments = tournaments[~dead[tournaments].any(axis=1)]
+            losers = tournaments.max(axis=1)
+            # The batch is cut at the first tournament with a member which lost an earlier tournament of the batch
+            lost, first_losses = numpy.unique(losers, return_index=True)
+            positions = numpy.minimum(numpy.searchsorted(lost, tournaments), max(len(lost) - 1, 0))
+            conflicts = (lost[positions] == tournaments) & (first_losses[positions] <
+                                                            numpy.arange(len(losers))[:, numpy.newaxis])
+            conflicting = numpy.flatnonzero(conflicts.any(axis=1))
+            played = conflicting[0] if len(conflicting) else len(losers)
+            dead[losers[:played]] = True
+            remaining -= played
+            dead_candidates += played
+            # Drop the eliminated candidates once they would reject too many tournaments
+            if dead_candidates * 2 * k > len(candidates):
+                candidates = candidates[~dead[candidates]]
+                dead_candidates = 0
+        return population.take(numpy.flatnonzero(~dead))
     return select
@@ -2,16 +2,77 @@
 These functions determine how to choose the next generation
 """
 
+import numpy
+
 import pareto
+import populations
+
+
+def plus(population, children, select_survivors):
+    return select_survivors(pareto.rank(population.add(children)))
+
+
+def comma(population, children, select_survivors):
+    pool = population.add(children)
+    return select_survivors(pareto.rank(pool.take(slice(len(population), None))))
+
 
+class IncrementalPlus:
+    def __init__(self, population_size):
+        """
+        A plus strategy with truncation survival which keeps the population in a pareto.ParetoArchive,
+         so each generation only inserts the children instead of re-sorting parents and children together
+        Children are copied into the storage rows freed by the previous truncation, so apart from copying the
+         arrays of the new population, a generation costs in proportion to the number of children
+        The select_survivors argument of select is ignored, truncation is built in
+        """
+        self.population_size = population_size
+        self.archive = pareto.ParetoArchive()
+        self.population = None
+        self.genomes = None
+        self.counts = None
+        # Storage rows which are not members of the population
+        self.free_rows = list()
 
-def plus(zipped, zipped_children, select_survivors):
-    zipped += zipped_children
-    zipped = pareto.generate_zipped_from_fronts(pareto.generate_fronts(zipped))
-    return select_survivors(zipped)
+    def load(self, population):
+        self.archive.load(population.ranks, population.fitnesses, population.simplicities, population.rows)
+        self.genomes = population.genomes
+        self.counts = population.counts
+        free_rows = numpy.ones(shape=len(self.genomes), dtype=bool)
+        free_rows[population.rows] = False
+        self.free_rows = numpy.flatnonzero(free_rows).tolist()
 
+    def take_free_rows(self, count):
+        """
+        Grows the storage if there are fewer than count free rows
+        :return: numpy.array, count free rows, which are no longer free
+        """
+        missing = count - len(self.free_rows)
+        if missing > 0:
+            self.free_rows += range(len(self.genomes), len(self.genomes) + missing)
+            self.genomes = numpy.concatenate((self.genomes, numpy.empty(shape=(missing,) + self.genomes.shape[1:],
+                                                                        dtype=self.genomes.dtype)))
+            if self.counts is not None:
+                self.counts = numpy.concatenate((self.counts, numpy.empty(shape=(missing,) + self.counts.shape[1:],
+                                                                          dtype=self.counts.dtype)))
+        rows = numpy.array(self.free_rows[len(self.free_rows) - count:], dtype=numpy.int64)
+        del self.free_rows[len(self.free_rows) - count:]
+        return rows
 
-def comma(zipped, zipped_children, select_survivors):
-    del zipped
-    zipped_children = pareto.generate_zipped_from_fronts(pareto.generate_fronts(zipped_children))
-    return select_survivors(zipped_children)
+    def select(self, population, children, select_survivors):
+        # Reload the archive if the population was changed by something else (such as migration)
+        if population is not self.population:
+            self.load(population)
+        child_rows = self.take_free_rows(len(children))
+        self.genomes[child_rows] = children.member_genomes()
+        if self.counts is not None:
+            self.counts[child_rows] = children.member_counts()
+        for fitness, simplicity, row in zip(children.fitnesses.tolist(), children.simplicities.tolist(),
+                                            child_rows.tolist()):
+            self.archive.insert(fitness, simplicity, row)
+        # Tag fronts as plus does, counting the fronts of parents and children together before truncation
+        top = len(self.archive.fronts)
+        self.free_rows += self.archive.truncate(self.population_size).tolist()
+        ranks, fitnesses, simplicities, rows = self.archive.contents(top)
+        self.population = populations.Population(self.genomes, rows, ranks, fitnesses, simplicities, self.counts)
+        return self.population
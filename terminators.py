@@ -2,7 +2,7 @@
 Classes which tell the EA when to stop
 """
 
-import itertools
+import numpy
 
 import pareto
 
@@ -14,8 +14,8 @@ class StableAverage:
         self.matching_averages = 0
         self.previous_average = -1
 
-    def evaluate(self, zipped):
-        average = float(sum(x[0] for x in zipped)) / len(zipped)
+    def evaluate(self, population):
+        average = float(numpy.sum(population.ranks)) / len(population)
         if average == self.previous_average:
             self.matching_averages += 1
             if self.matching_averages >= self.n:
@@ -32,8 +32,8 @@ class StableBest:
         self.matching_bests = 0
         self.previous_best = -1
 
-    def evaluate(self, zipped):
-        best = max(zipped)
+    def evaluate(self, population):
+        best = max(zip(population.ranks, population.fitnesses, population.simplicities))
         if best == self.previous_best:
             self.matching_bests += 1
             if self.matching_bests >= self.n:
@@ -48,15 +48,16 @@ class StablePareto:
     def __init__(self, n):
         self.n = n
         self.match_count = 1
-        self.matching_front = list()
+        self.matching_front = None
 
-    def evaluate(self, zipped):
-        front = list(pareto.get_best_front(zipped))
-        if pareto.fronts_equal(front, self.matching_front):
+    def evaluate(self, population):
+        front = pareto.get_best_front(population)
+        if self.matching_front is not None and pareto.fronts_equal(front, self.matching_front):
             self.match_count += 1
             if self.match_count >= self.n:
                 return True
         else:
             self.match_count = 1
-            self.matching_front = list(front)
+            # Keep a copy so that the front does not hold on to the whole population's storage
+            self.matching_front = front.compact()
         return False
@@ -0,0 +1,54 @@
+"""
+Tests of the population container
+Run with: python -m unittest test_populations
+"""
+
+import unittest
+
+import numpy
+
+import populations
+
+
+def make_population(genomes, counts=None):
+    genomes = numpy.asarray(genomes)
+    return populations.create(genomes, numpy.arange(len(genomes)), numpy.zeros(shape=len(genomes)), counts)
+
+
+class AddTest(unittest.TestCase):
+    def test_appends_children_after_members(self):
+        population = make_population([[0, 1], [1, 1], [-1, 0]]).take([2, 0])
+        children = make_population([[1, -1], [0, 0]])
+        pool = population.add(children)
+        numpy.testing.assert_array_equal(pool.member_genomes(), [[-1, 0], [0, 1], [1, -1], [0, 0]])
+        numpy.testing.assert_array_equal(pool.fitnesses, [2, 0, 0, 1])
+
+    def test_reuses_rows_which_are_not_members(self):
+        population = make_population([[0, 1], [1, 1], [-1, 0]]).take([0, 2])
+        pool = population.add(make_population([[1, -1]]))
+        self.assertIs(pool.genomes, population.genomes)
+        numpy.testing.assert_array_equal(pool.rows, [0, 2, 1])
+
+    def test_growing_leaves_the_population_unchanged(self):
+        counts = numpy.array([[1, 0], [2, 1]])
+        population = make_population([[0, 1], [1, 1]], counts)
+        genomes, rows = population.genomes, population.rows.copy()
+        pool = population.add(make_population([[1, -1], [0, 0]], numpy.array([[0, 0], [1, 2]])))
+        self.assertIs(population.genomes, genomes)
+        self.assertIs(population.counts, counts)
+        numpy.testing.assert_array_equal(population.rows, rows)
+        numpy.testing.assert_array_equal(population.member_genomes(), [[0, 1], [1, 1]])
+        numpy.testing.assert_array_equal(pool.member_genomes(), [[0, 1], [1, 1], [1, -1], [0, 0]])
+        numpy.testing.assert_array_equal(pool.member_counts(), [[1, 0], [2, 1], [0, 0], [1, 2]])
+
+    def test_compacted_populations_keep_their_genomes(self):
+        storage = make_population([[0, 1], [1, 1]])
+        shared = storage.take([1])
+        kept = shared.compact()
+        storage.take([0]).add(make_population([[-1, -1]]))
+        numpy.testing.assert_array_equal(shared.member_genomes(), [[-1, -1]])
+        numpy.testing.assert_array_equal(kept.member_genomes(), [[1, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()